@@ -2,6 +2,8 @@
 ASGI config for activity_logger project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serves async views such as the activity status stream, run with uvicorn:
+    uvicorn activity_logger.asgi:application
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +11,14 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
+from django.conf import settings
+from django.contrib.staticfiles.handlers import ASGIStaticFilesHandler
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'activity_logger.settings')
 
 application = get_asgi_application()
+
+# Serve admin static files like runserver does in development
+if settings.DEBUG:
+    application = ASGIStaticFilesHandler(application)
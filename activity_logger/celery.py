@@ -7,6 +7,7 @@ app = Celery('activity_logger')
 app.config_from_object('django.conf:settings', namespace='CELERY')
 
 import realtime_config.celery_init
+import core.celery_init
 
 app.autodiscover_tasks()
 
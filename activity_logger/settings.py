@@ -21,6 +21,8 @@ celery_task_limit_soft_seconds = 25 * 60
 requeue_pending_minutes = 5
 # Requeue task expires after:
 requeue_expire_minutes = 4
+# Status counts are rebuilt from the database every:
+reconcile_counts_minutes = 10
 
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -60,6 +62,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'realtime_config.middleware.LogRequestPIDMiddleware',
+    'realtime_config.middleware.ConfigSnapshotMiddleware',
     
     'django_prometheus.middleware.PrometheusBeforeMiddleware',
     'django.middleware.security.SecurityMiddleware',
@@ -114,10 +117,16 @@ CELERY_RESULT_SERIALIZER = 'json'
 # If storing task results in Django
 # CELERY_RESULT_BACKEND = 'django-db'
 CELERY_TASK_TIME_LIMIT = celery_task_limit_seconds
+# Logging goes through the LOGGING handlers, not a handler Celery puts on the root logger
+CELERY_WORKER_HIJACK_ROOT_LOGGER = False
 CELERY_TASK_SOFT_TIME_LIMIT = celery_task_limit_soft_seconds
 
+# Activity batches go to the queue of their lane, chosen at dispatch (core/lanes.py):
+# activities.interactive for new activities, activities.retry for requeues,
+# activities.bulk for bulk ingestion. Maintenance tasks run on the retry lane
 CELERY_TASK_ROUTES = {
-    'core.tasks.process_activity': {'queue': 'activities'},
+    'core.tasks.process_activity': {'queue': 'activities.interactive'},
+    'core.tasks.process_activities_batch': {'queue': 'activities.interactive'},
 }
 
 CELERY_BEAT_SCHEDULE = {
@@ -125,10 +134,26 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'core.tasks.requeue_pending_activities',
         'schedule': crontab(minute='*/' + str(requeue_pending_minutes)),
         'options': {
-            'queue': 'activities',
+            'queue': 'activities.retry',
             'expires': 60 * requeue_expire_minutes,
         },
     },
+    'reconcile-status-counts': {
+        'task': 'core.tasks.reconcile_status_counts',
+        'schedule': crontab(minute='*/' + str(reconcile_counts_minutes)),
+        'options': {
+            'queue': 'activities.retry',
+            'expires': 60 * reconcile_counts_minutes,
+        },
+    },
+    'ensure-activity-partitions': {
+        'task': 'core.tasks.ensure_activity_partitions',
+        'schedule': crontab(minute=0, hour=3),
+        'options': {
+            'queue': 'activities.retry',
+            'expires': 60 * 60,
+        },
+    },
 }
 
 
@@ -162,6 +187,16 @@ CONSTANCE_CONFIG: Dict[str, Tuple[Any, str, type]] = {
     'ACTIVITY_POLLING_S': (2.0, 'Polling interval for activity app, s', float),
     
     'TASK_PROCESSING_DELAY_S': (5.0, 'Artificial delay in task processing, s', float),
+    'ACTIVITY_BATCH_SIZE': (50, 'Activities per batch processing task', int),
+    'REQUEUE_MAX_PER_RUN': (10000, 'Most activities requeued by one beat run', int),
+    'ASYNC_WORKER_MAX_IN_FLIGHT': (1000, 'Most activities processed at once by one asyncio worker', int),
+    'WORKER_CONCURRENCY_INTERACTIVE': (4, 'Worker processes for new activities', int),
+    'WORKER_CONCURRENCY_RETRY': (2, 'Worker processes for requeued and retried activities', int),
+    'WORKER_CONCURRENCY_BULK': (2, 'Worker processes for bulk ingested activities', int),
+    'AUTOSCALE_ENABLED': (True, 'Let the autoscaler set worker concurrency of every lane', bool),
+    'AUTOSCALE_MIN_CONCURRENCY': (1, 'Fewest worker processes the autoscaler keeps per lane worker', int),
+    'AUTOSCALE_MAX_CONCURRENCY': (8, 'Most worker processes the autoscaler starts per lane worker', int),
+    'AUTOSCALE_TARGET_DRAIN_S': (30.0, 'Time the autoscaler sizes lanes to drain their queue in, s', float),
 
     # Configs for realtime config view
     'SITE_NAME': ('Config Manager', 'Site name', str),
@@ -172,6 +207,9 @@ CONSTANCE_CONFIG: Dict[str, Tuple[Any, str, type]] = {
 
     'SHOW_LOGS': (True, 'Show change logs', bool),
     'LOGS_COUNT': (10, 'Number of recent change logs to show', int),
+    'LOG_SAMPLE_RATES': ('{"realtime_config.middleware": 0.01, "core.tasks": 0.1, "core.dispatch": 0.1, '
+                         '"core.claims": 0.1, "core.pipeline": 0.1}',
+                         'Share of INFO/DEBUG records kept per logger name prefix, JSON', str),
 
     'UI_POLLING_INTERVAL': (300.0, 'Polling interval for real-time UI, s', float),
 }
@@ -181,15 +219,29 @@ CONSTANCE_CONFIG_FIELDSETS: Dict[str, Tuple[str, ...]] = {
     'Activity MET Values': ('MET_RUN', 'MET_WALK', 'MET_CYCLE', 'MET_SWIM', 'MET_YOGA'),
     'User Default': ('DEFAULT_WEIGHT',),
     'UI': ('ACTIVITIES_PER_PAGE', 'ACTIVITY_POLLING_S'),
-    'Demo Task Processing': ('TASK_PROCESSING_DELAY_S',),
+    'Demo Task Processing': ('TASK_PROCESSING_DELAY_S', 'ACTIVITY_BATCH_SIZE', 'REQUEUE_MAX_PER_RUN',
+                             'ASYNC_WORKER_MAX_IN_FLIGHT', 'WORKER_CONCURRENCY_INTERACTIVE',
+                             'WORKER_CONCURRENCY_RETRY', 'WORKER_CONCURRENCY_BULK'),
+    'Worker Autoscaling': ('AUTOSCALE_ENABLED', 'AUTOSCALE_MIN_CONCURRENCY', 'AUTOSCALE_MAX_CONCURRENCY',
+                           'AUTOSCALE_TARGET_DRAIN_S'),
 
     'General': ('SITE_NAME', 'THEME_COLOR', 'MAINTENANCE_MODE'),
     'Content': ('WELCOME_MESSAGE', 'ITEMS_PER_PAGE'),
-    'Logging': ('SHOW_LOGS', 'LOGS_COUNT'),
+    'Logging': ('SHOW_LOGS', 'LOGS_COUNT', 'LOG_SAMPLE_RATES'),
     'Demo': ('UI_POLLING_INTERVAL',)
 }
 
 REDIS_PUB_SUB_CHANNEL: str = 'realtime_config_updates'
+# Counter of published config changes, to detect missed Pub/Sub messages
+REDIS_CONFIG_VERSION_KEY: str = 'realtime_config_version'
+
+# Activity status transitions for server-sent events
+ACTIVITY_STATUS_CHANNEL: str = 'activity_status_updates'
+
+# Where activities are processed: 'celery' tasks or 'asyncio' worker (manage.py run_async_worker)
+ACTIVITY_PROCESSING_BACKEND: str = env('ACTIVITY_PROCESSING_BACKEND', default='celery')
+# Prefix of Redis lists the asyncio worker takes activity ids from, one per lane
+ACTIVITY_ASYNC_QUEUE: str = 'activities:async'
 
 # Time to wait for before trying to connect to Redis again
 REDIS_RETRY_INTERVAL: float = 10.0
@@ -209,12 +261,23 @@ LOGGING: Dict[str, Any] = {
             'format': '{levelname} {asctime} {name}: {message}',
             'style': '{',
         },
+        'json': {
+            '()': 'realtime_config.log_handlers.JsonFormatter',
+        },
+    },
+    # Per-logger sampling below WARNING, LOG_SAMPLE_RATES realtime config
+    'filters': {
+        'sampling': {
+            '()': 'realtime_config.log_handlers.SamplingFilter',
+        },
     },
     'handlers': {
+        # Records are queued and written by a listener thread, not by the caller
         'console': {
             'level': 'DEBUG',
-            'class': 'logging.StreamHandler',
-            'formatter': 'simple',
+            '()': 'realtime_config.log_handlers.QueueLogHandler',
+            'formatter': 'json',
+            'filters': ['sampling'],
         },
     },
     'loggers': {
@@ -235,9 +298,14 @@ LOGGING: Dict[str, Any] = {
         },
         'realtime_config': {
             'handlers': ['console'],
-            'level': 'DEBUG',
+            'level': 'INFO',
             'propagate': True,
         },
+        'core': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
     },
 }
 
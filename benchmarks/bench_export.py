@@ -0,0 +1,67 @@
+"""
+Throughput and memory of the streaming activity export against the configured database.
+
+Encodes every activity without writing the output, peak Python memory is traced
+to check it stays flat as the table grows.
+
+    python -m benchmarks.bench_export --format csv --gzip
+"""
+import argparse
+import json
+import os
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'activity_logger.settings')
+django.setup()
+
+from django.db import connection
+
+from core.export import build_export_queryset, export_blocks, export_chunk_size, EXPORT_FORMATS
+
+
+def run(fmt, compress, chunk_size):
+    queryset = build_export_queryset()
+    rows = 0
+    output_bytes = 0
+
+    def count(row_count):
+        nonlocal rows
+        rows = row_count
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    for block in export_blocks(queryset, fmt, compress, chunk_size=chunk_size, progress=count):
+        output_bytes += len(block)
+    duration = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'format': fmt,
+        'gzip': compress,
+        'chunk_size': chunk_size,
+        'rows': rows,
+        'seconds': round(duration, 3),
+        'rows_per_s': round(rows / duration) if duration else None,
+        'output_mb': round(output_bytes / 2 ** 20, 2),
+        'peak_traced_mb': round(peak / 2 ** 20, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--format', default='csv', choices=EXPORT_FORMATS)
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('--chunk-size', type=int, default=export_chunk_size)
+    args = parser.parse_args()
+
+    results = run(args.format, args.gzip, args.chunk_size)
+    results['database'] = connection.vendor
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
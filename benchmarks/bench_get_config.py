@@ -0,0 +1,109 @@
+"""
+Microbenchmark of realtime_config.get_config cache hits under concurrent threads.
+
+Compares the lock-free snapshot read with the previous implementation,
+which took the global cache lock and formatted a debug line on every hit.
+
+    python -m benchmarks.bench_get_config --threads 32 --calls 20000
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import threading
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'activity_logger.settings')
+django.setup()
+
+from django.conf import settings
+
+from realtime_config import realtime_config
+
+
+logger = logging.getLogger('realtime_config.realtime_config')
+
+# Calls timed together, per-call latency is the batch average
+batch_size = 100
+
+
+def make_locked_get_config(cache):
+    """
+    Previous hit path: lock on every call, eagerly formatted debug log.
+    """
+    lock = threading.Lock()
+
+    def locked_get_config(key):
+        current_pid = os.getpid()
+        with lock:
+            if key in cache:
+                logger.debug(f"Config {key} retrieved from local cache - "
+                             f"{cache[key]} (PID: {current_pid})")
+                return cache[key]
+
+    return locked_get_config
+
+
+def run(get_config, keys, threads, calls):
+    """
+    Call get_config from all threads at once, return latency stats in ns per call.
+    """
+    barrier = threading.Barrier(threads + 1)
+    batch_latencies = [[] for _ in range(threads)]
+
+    def worker(index):
+        samples = batch_latencies[index]
+        key_count = len(keys)
+        barrier.wait()
+        for start in range(0, calls, batch_size):
+            batch_start = time.perf_counter_ns()
+            for i in range(start, start + batch_size):
+                get_config(keys[i % key_count])
+            samples.append((time.perf_counter_ns() - batch_start) / batch_size)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+
+    barrier.wait()
+    wall_start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    wall_s = time.perf_counter() - wall_start
+
+    latencies = sorted(sample for samples in batch_latencies for sample in samples)
+    return {
+        'calls_per_s': round(threads * calls / wall_s),
+        'mean_ns': round(statistics.fmean(latencies), 1),
+        'p50_ns': round(latencies[len(latencies) // 2], 1),
+        'p99_ns': round(latencies[int(len(latencies) * 0.99)], 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--calls', type=int, default=20000, help="Calls per thread")
+    args = parser.parse_args()
+
+    # Hits only: fill both caches with constance defaults
+    values = {key: definition[0] for key, definition in settings.CONSTANCE_CONFIG.items()}
+    realtime_config._update_cache(values)
+    keys = list(values)
+
+    results = {
+        'threads': args.threads,
+        'calls_per_thread': args.calls,
+        'before_locked': run(make_locked_get_config(dict(values)), keys,
+                             args.threads, args.calls),
+        'after_lock_free': run(realtime_config.get_config, keys,
+                               args.threads, args.calls),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
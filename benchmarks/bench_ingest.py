@@ -0,0 +1,99 @@
+"""
+Throughput of bulk activity ingestion against the configured database.
+
+Compares one ActivityForm validation and save per row, as the create view does,
+with core.ingest (one validator, chunked bulk_create or COPY on Postgres).
+Only a Postgres run measures the COPY path.
+Every run is rolled back and nothing is queued.
+
+    python -m benchmarks.bench_ingest --rows 20000 --chunk-size 5000
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'activity_logger.settings')
+django.setup()
+
+from django.db import connection, transaction
+
+from core.enums import ActivityType
+from core.forms import ActivityForm
+from core.ingest import ingest_activities
+
+
+def make_rows(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            'activity_type': rng.choice(ActivityType._ALL_VALUES),
+            'duration_minutes': rng.randint(5, 180),
+            'weight_kg': f"{rng.uniform(45, 120):.2f}",
+            'notes': rng.choice(['', 'morning', 'after work']),
+        }
+        for _ in range(count)
+    ]
+
+
+def per_row_forms(rows):
+    for row in rows:
+        form = ActivityForm(data=row)
+        if form.is_valid():
+            form.save()
+
+
+def bulk(rows, chunk_size):
+    ingest_activities(rows, chunk_size=chunk_size, enqueue=False)
+
+
+def timed(function, *args):
+    """
+    Run function in a transaction that is rolled back, return seconds taken.
+    """
+    with transaction.atomic():
+        start = time.perf_counter()
+        function(*args)
+        duration = time.perf_counter() - start
+        transaction.set_rollback(True)
+    return duration
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=20000)
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--form-rows', type=int, default=2000,
+                        help="Rows for the slow per-row baseline")
+    args = parser.parse_args()
+
+    rows = make_rows(args.rows)
+    form_rows = rows[:args.form_rows]
+
+    form_s = timed(per_row_forms, form_rows)
+    bulk_s = timed(bulk, rows, args.chunk_size)
+
+    results = {
+        'database': connection.vendor,
+        'per_row_forms': {
+            'rows': len(form_rows),
+            'seconds': round(form_s, 3),
+            'rows_per_s': round(len(form_rows) / form_s),
+        },
+        'bulk_ingest': {
+            # Path taken by core.ingest.insert_activities on this database
+            'insert': 'copy' if connection.vendor == 'postgresql' else 'bulk_create',
+            'rows': len(rows),
+            'chunk_size': args.chunk_size,
+            'seconds': round(bulk_s, 3),
+            'rows_per_s': round(len(rows) / bulk_s),
+        },
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,337 @@
+"""
+End-to-end load benchmark of the activity pipeline.
+
+Drives the create view, the status APIs and process_activity at a given rate
+and reports throughput and p50/p95/p99 latency per stage as JSON.
+Runs against the configured Postgres and Redis (use a scratch database, created activities
+are deleted afterwards but rollups keep them), or with --local against a temporary
+SQLite database and an in-process fakeredis, one request at a time.
+
+    python -m benchmarks.bench_pipeline --activities 500 --rate 100 --concurrency 4 -o run.json
+    python -m benchmarks.bench_pipeline --local --activities 200 --compare run.json
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+
+logger = logging.getLogger(__name__)
+
+STAGES = ('create', 'status', 'status_list', 'process')
+# Ids per request of the status list stage
+status_list_size = 50
+# Relative change of p95 latency or throughput reported as a regression by --compare
+compare_tolerance = 0.10
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--activities', type=int, default=200, help="Activities created and processed")
+    parser.add_argument(
+        '--rate', type=float, default=0,
+        help="Requests started per second in every stage, 0 for as fast as possible"
+    )
+    parser.add_argument(
+        '--concurrency', type=int, default=1,
+        help="Requests in flight at once, always 1 with --local"
+    )
+    parser.add_argument(
+        '--delay', type=float, default=0.0,
+        help="TASK_PROCESSING_DELAY_S while processing, s (default 0, pipeline overhead only)"
+    )
+    parser.add_argument('--stages', default=','.join(STAGES), help=f"Comma separated subset of {','.join(STAGES)}")
+    parser.add_argument('--local', action='store_true', help="Temporary SQLite database and fakeredis")
+    parser.add_argument('--keep', action='store_true', help="Don't delete created activities")
+    parser.add_argument('--output', '-o', help="Write results JSON to this file, stdout otherwise")
+    parser.add_argument('--compare', metavar='BASELINE', help="Results JSON of a previous run to compare with")
+    parser.add_argument(
+        '--tolerance', type=float, default=compare_tolerance,
+        help=f"Relative regression that fails --compare (default {compare_tolerance})"
+    )
+    return parser.parse_args(argv)
+
+
+def use_local_services():
+    """
+    Point Django at a temporary SQLite file and every Redis client at one fakeredis server.
+    Must run before Django and the apps create their clients.
+    """
+    import fakeredis
+    import redis
+    import redis.client
+
+    server = fakeredis.FakeServer()
+
+    class FakeConnectionPool(redis.ConnectionPool):
+        def __init__(self, *args, **kwargs):
+            kwargs.update(connection_class=fakeredis.FakeConnection, server=server)
+            super().__init__(*args, **kwargs)
+
+    redis.ConnectionPool = FakeConnectionPool
+    redis.client.ConnectionPool = FakeConnectionPool
+
+    db_path = os.path.join(tempfile.mkdtemp(prefix='bench_pipeline_'), 'db.sqlite3')
+    os.environ['DATABASE_URL'] = f"sqlite:///{db_path}"
+    os.environ.pop('PROMETHEUS_MULTIPROC_DIR', None)
+    return db_path
+
+
+def percentile(sorted_values, fraction):
+    # Nearest rank
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, duration):
+    latencies = sorted(latencies)
+    count = len(latencies)
+
+    def ms(value):
+        return None if value is None else round(value * 1000, 3)
+
+    return {
+        'requests': count,
+        'errors': errors,
+        'seconds': round(duration, 3),
+        'throughput_per_s': round(count / duration, 1) if duration else None,
+        'mean_ms': ms(sum(latencies) / count) if count else None,
+        'p50_ms': ms(percentile(latencies, 0.50)),
+        'p95_ms': ms(percentile(latencies, 0.95)),
+        'p99_ms': ms(percentile(latencies, 0.99)),
+        'max_ms': ms(latencies[-1]) if count else None,
+    }
+
+
+def drive(call, items, rate, concurrency):
+    """
+    Call call(item) for every item from concurrency threads, started at rate per second.
+    With a rate, latency is measured from the scheduled start, so time spent waiting
+    for a free thread counts (no coordinated omission).
+    call returns False or raises on error.
+    """
+    from django.db import close_old_connections
+
+    items = list(items)
+    start = time.perf_counter()
+
+    def run_one(indexed_item):
+        index, item = indexed_item
+        scheduled = start + index / rate if rate else time.perf_counter()
+        wait = scheduled - time.perf_counter()
+        if wait > 0:
+            time.sleep(wait)
+        if not rate:
+            scheduled = time.perf_counter()
+        try:
+            ok = call(item) is not False
+        except Exception as e:
+            logger.warning(f"Request for {item} failed: {e}")
+            ok = False
+        finally:
+            # As at the end of a real request
+            close_old_connections()
+        return ok, time.perf_counter() - scheduled
+
+    with ThreadPoolExecutor(max_workers=max(1, concurrency)) as pool:
+        outcomes = list(pool.map(run_one, enumerate(items)))
+    duration = time.perf_counter() - start
+
+    latencies = [latency for ok, latency in outcomes if ok]
+    return summarize(latencies, len(outcomes) - len(latencies), duration)
+
+
+class PipelineBenchmark:
+    """
+    One run: create activities through the view, read their statuses, process them.
+    Activities are marked with a run id in notes.
+    """
+
+    def __init__(self, args):
+        from django.test import Client
+
+        self.args = args
+        self.run_id = uuid.uuid4().hex[:12]
+        self.marker = f"bench {self.run_id}"
+        self._local = threading.local()
+        self._client_class = Client
+
+    @property
+    def client(self):
+        if not hasattr(self._local, 'client'):
+            self._local.client = self._client_class()
+        return self._local.client
+
+    def activity_ids(self):
+        from core.models import Activity
+
+        return list(Activity.objects.filter(notes=self.marker).order_by('id').values_list('id', flat=True))
+
+    def create(self, index):
+        from core.enums import ActivityType
+
+        activity_types = ActivityType._ALL_VALUES
+        response = self.client.post('/activity/create/', {
+            'activity_type': activity_types[index % len(activity_types)],
+            'duration_minutes': 5 + index % 120,
+            'weight_kg': '70.00',
+            'notes': self.marker,
+        })
+        return response.status_code == 302
+
+    def status(self, activity_id):
+        return self.client.get(f'/api/activity/{activity_id}/status/').status_code == 200
+
+    def status_list(self, ids):
+        response = self.client.get('/api/activities/status/', {'ids': ','.join(map(str, ids))})
+        return response.status_code == 200
+
+    def process(self, activity_id):
+        from core.tasks import process_activity
+
+        return process_activity.apply(args=(activity_id,)).result is True
+
+    def run(self, stages):
+        from core.models import OutboxMessage
+
+        args = self.args
+        results = {}
+
+        if 'create' in stages:
+            results['create'] = drive(self.create, range(args.activities), args.rate, args.concurrency)
+        ids = self.activity_ids()
+
+        if 'status' in stages:
+            results['status'] = drive(self.status, ids, args.rate, args.concurrency)
+        if 'status_list' in stages:
+            groups = [ids[start:start + status_list_size] for start in range(0, len(ids), status_list_size)]
+            results['status_list'] = drive(self.status_list, groups, args.rate, args.concurrency)
+
+        if 'process' in stages:
+            # Processed here, not by workers of a running stack
+            OutboxMessage.objects.filter(activity_id__in=ids).delete()
+            results['process'] = drive(self.process, ids, args.rate, args.concurrency)
+
+        return results
+
+    def cleanup(self):
+        from core.models import Activity
+
+        Activity.objects.filter(notes=self.marker).delete()
+
+
+def set_processing_delay(delay):
+    """
+    Set TASK_PROCESSING_DELAY_S, return the previous value.
+    """
+    from constance import config as constance_config
+    from realtime_config import realtime_config
+
+    previous = realtime_config.get_config('TASK_PROCESSING_DELAY_S', 5.0)
+    setattr(constance_config, 'TASK_PROCESSING_DELAY_S', delay)
+    # Don't wait for the Pub/Sub message
+    realtime_config.warm_cache()
+    return previous
+
+
+def compare(results, baseline, tolerance):
+    """
+    Print per stage change against baseline, return names of regressed stages.
+    """
+    regressed = []
+    for stage, current in results['stages'].items():
+        previous = baseline.get('stages', {}).get(stage)
+        if not previous:
+            continue
+        changes = []
+        is_regression = False
+        for key, higher_is_worse in (('p95_ms', True), ('p99_ms', True), ('throughput_per_s', False)):
+            before, after = previous.get(key), current.get(key)
+            if not before or after is None:
+                continue
+            change = (after - before) / before
+            changes.append(f"{key} {before} -> {after} ({change:+.1%})")
+            if key != 'p99_ms' and (change > tolerance if higher_is_worse else change < -tolerance):
+                is_regression = True
+        print(f"{stage}: {', '.join(changes)}{' REGRESSION' if is_regression else ''}", file=sys.stderr)
+        if is_regression:
+            regressed.append(stage)
+    return regressed
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = [stage.strip() for stage in args.stages.split(',') if stage.strip()]
+    unknown = set(stages) - set(STAGES)
+    if unknown:
+        sys.exit(f"Unknown stages: {', '.join(sorted(unknown))}")
+
+    db_path = use_local_services() if args.local else None
+    if args.local and args.concurrency > 1:
+        # SQLite can't upgrade concurrent read transactions to writes (claims), they fail with
+        # 'database is locked' and Django 4.2 can't start them as IMMEDIATE
+        logger.warning(f"--local runs one request at a time, --concurrency {args.concurrency} ignored")
+        args.concurrency = 1
+
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'activity_logger.settings')
+    django.setup()
+
+    from django.conf import settings
+    from django.core.management import call_command
+    from django.db import connection
+
+    if args.local:
+        call_command('migrate', verbosity=0)
+    if 'testserver' not in settings.ALLOWED_HOSTS:
+        settings.ALLOWED_HOSTS.append('testserver')
+
+    previous_delay = set_processing_delay(args.delay)
+    benchmark = PipelineBenchmark(args)
+    try:
+        stage_results = benchmark.run(stages)
+    finally:
+        set_processing_delay(previous_delay)
+        if db_path:
+            connection.close()
+            shutil.rmtree(os.path.dirname(db_path), ignore_errors=True)
+        elif not args.keep:
+            benchmark.cleanup()
+
+    results = {
+        'started_at': datetime.now(timezone.utc).isoformat(),
+        'database': connection.vendor,
+        'redis': 'fakeredis' if args.local else 'redis',
+        'activities': args.activities,
+        'rate': args.rate,
+        'concurrency': args.concurrency,
+        'delay_s': args.delay,
+        'stages': stage_results,
+    }
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Activity
+from .models import Activity, ActivityArchive
 
 # Register your models here.
 
@@ -25,3 +25,23 @@ class ActivityAdmin(admin.ModelAdmin):
         'status',
         'error_message'
     )
+
+
+@admin.register(ActivityArchive)
+class ActivityArchiveAdmin(admin.ModelAdmin):
+    list_display = (
+        'id',
+        'activity_type',
+        'duration_minutes',
+        'status',
+        'created_at',
+        'calories_burned')
+
+    list_filter = ('status', 'activity_type')
+    search_fields = ('notes',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
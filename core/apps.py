@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        # Connect signal receivers
+        from . import events  # noqa: F401
+        from . import status_counts  # noqa: F401
+        from . import status_cache  # noqa: F401
+        from . import rollups  # noqa: F401
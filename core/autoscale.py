@@ -0,0 +1,176 @@
+import logging
+import math
+import time
+
+from celery import current_app
+from constance import config as constance_config
+
+from .enums import ProcessingLane
+from .exporter import multiproc_root
+from .lanes import LANE_CONCURRENCY_CONFIGS, get_lane_concurrency, record_queue_depths
+from .metrics import MultiProcessTreeCollector
+from .monitoring import BATCH_LABEL
+
+from realtime_config.realtime_config import get_config, get_configs
+
+
+logger = logging.getLogger(__name__)
+
+# Time between autoscaler samples, s
+autoscale_interval_s = 15.0
+# A lane is shrunk only after its backlog stayed low for this long, s
+scale_down_delay_s = 60.0
+# Timeout of the worker ping used to count workers per lane, s
+ping_timeout_s = 1.0
+
+# Stages that add up to the time a batch holds a worker process
+BATCH_STAGES = ('db_load', 'status_write', 'compute')
+STAGE_METRIC = 'activity_stage_duration_seconds'
+
+
+def read_batch_time_totals(root=multiproc_root):
+    """
+    (total seconds, number of batches) of processed batches, from the stage histogram
+    merged over every worker process like a scrape.
+    """
+    seconds = 0.0
+    batches = 0
+    for metric in MultiProcessTreeCollector(root).collect():
+        if metric.name != STAGE_METRIC:
+            continue
+        for sample in metric.samples:
+            if sample.labels.get('activity_type') != BATCH_LABEL:
+                continue
+            stage = sample.labels.get('stage')
+            if sample.name == f"{STAGE_METRIC}_sum" and stage in BATCH_STAGES:
+                seconds += sample.value
+            elif sample.name == f"{STAGE_METRIC}_count" and stage == 'compute':
+                batches += sample.value
+    return seconds, batches
+
+
+def count_lane_workers(app=None):
+    """
+    Live workers per lane, by their node name prefix (-n <lane>@%h).
+    """
+    app = app or current_app
+    counts = dict.fromkeys(ProcessingLane.values, 0)
+    for reply in app.control.ping(timeout=ping_timeout_s) or []:
+        for hostname in reply:
+            lane = hostname.split('@', 1)[0]
+            if lane in counts:
+                counts[lane] += 1
+    return counts
+
+
+class LaneAutoscaler:
+    """
+    Sizes the worker pools of every lane to drain its queue in AUTOSCALE_TARGET_DRAIN_S.
+
+    Each sample reads queue depths (LLEN, also set on the activity_queue_depth gauge)
+    and the mean time a batch holds a worker process (stage histogram, since the previous sample),
+    and computes processes per worker:
+        ceil(queued batches * mean batch time / target drain time / workers in lane)
+    clamped to AUTOSCALE_MIN_CONCURRENCY..AUTOSCALE_MAX_CONCURRENCY.
+    Growing is immediate, shrinking waits scale_down_delay_s and goes one process at a time.
+
+    The result is written to WORKER_CONCURRENCY_<LANE> realtime configs, published over
+    the config Pub/Sub channel; lane workers apply it with pool_grow/pool_shrink (celery_init.py).
+    """
+
+    def __init__(self, root=multiproc_root, interval_s=autoscale_interval_s,
+                 scale_down_delay_s=scale_down_delay_s, app=None):
+        self.root = root
+        self.interval_s = interval_s
+        self.scale_down_delay_s = scale_down_delay_s
+        self.app = app or current_app
+        self._last_totals = None
+        self._mean_batch_s = None
+        # Lane -> monotonic time since which it wanted fewer processes
+        self._shrink_wanted_since = {}
+
+    def sample_batch_time(self):
+        """
+        Mean batch time since the previous sample, the last known mean if no batch finished,
+        TASK_PROCESSING_DELAY_S before any batch was seen.
+        """
+        totals = read_batch_time_totals(self.root)
+        seconds, batches = totals
+        if self._last_totals is not None:
+            seconds -= self._last_totals[0]
+            batches -= self._last_totals[1]
+        self._last_totals = totals
+
+        # Counters reset when the metric files are wiped on a service restart
+        if batches > 0 and seconds >= 0:
+            self._mean_batch_s = seconds / batches
+        if self._mean_batch_s is None:
+            return float(get_config('TASK_PROCESSING_DELAY_S', 5.0))
+        return self._mean_batch_s
+
+    def desired_concurrency(self, depth, mean_batch_s, workers, bounds):
+        min_concurrency, max_concurrency, target_drain_s = bounds
+        needed = math.ceil(depth * mean_batch_s / max(target_drain_s, 1e-3) / max(workers, 1))
+        return max(min_concurrency, min(max_concurrency, needed))
+
+    def step(self):
+        """
+        Take one sample and update lane concurrency configs.
+        Return {lane: concurrency} after the step.
+        """
+        configs = get_configs([
+            'AUTOSCALE_ENABLED', 'AUTOSCALE_MIN_CONCURRENCY',
+            'AUTOSCALE_MAX_CONCURRENCY', 'AUTOSCALE_TARGET_DRAIN_S',
+        ])
+        # Sampled while autoscaling is off too, this is the source of the activity_queue_depth gauge
+        depths = record_queue_depths()['celery']
+        mean_batch_s = self.sample_batch_time()
+        lanes = ProcessingLane.values
+        if not configs['AUTOSCALE_ENABLED']:
+            return {lane: get_lane_concurrency(lane) for lane in lanes}
+
+        min_concurrency = max(1, int(configs['AUTOSCALE_MIN_CONCURRENCY']))
+        bounds = (
+            min_concurrency,
+            max(min_concurrency, int(configs['AUTOSCALE_MAX_CONCURRENCY'])),
+            float(configs['AUTOSCALE_TARGET_DRAIN_S']),
+        )
+        workers = count_lane_workers(self.app)
+
+        result = {}
+        for lane in lanes:
+            current = get_lane_concurrency(lane)
+            desired = self.desired_concurrency(depths[lane], mean_batch_s, workers[lane], bounds)
+            result[lane] = self.apply(lane, current, desired, depths[lane], mean_batch_s)
+        return result
+
+    def apply(self, lane, current, desired, depth, mean_batch_s):
+        if desired > current:
+            self._shrink_wanted_since.pop(lane, None)
+        elif desired < current:
+            now = time.monotonic()
+            since = self._shrink_wanted_since.setdefault(lane, now)
+            if now - since < self.scale_down_delay_s:
+                return current
+            self._shrink_wanted_since[lane] = now
+            desired = current - 1
+        else:
+            self._shrink_wanted_since.pop(lane, None)
+            return current
+
+        logger.info(f"Lane '{lane}': {depth} queued batches, {mean_batch_s:.2f}s per batch, "
+                    f"concurrency {current} -> {desired}")
+        setattr(constance_config, LANE_CONCURRENCY_CONFIGS[lane], desired)
+        return desired
+
+    def run(self, once=False):
+        while True:
+            try:
+                self.step()
+            except Exception as e:
+                logger.error(f"Autoscaler step failed: {e}")
+                if once:
+                    raise
+            if once:
+                return
+            time.sleep(self.interval_s)
@@ -0,0 +1,61 @@
+import numpy as np
+
+from .enums import ActivityType
+
+
+# Distance of value * 100 from a .5 tie below which numpy rounding is re-checked
+_tie_tolerance = 1e-6
+
+
+def _round_like_python(values):
+    """
+    Round to 2 decimals exactly like builtin round(value, 2).
+
+    np.round scales by 100 before rounding, which can land on the other side of a tie
+    than Python's correctly rounded round(). Values close to a tie are redone with round().
+    """
+    rounded = np.round(values, 2)
+
+    scaled = values * 100.0
+    near_tie = np.abs(scaled - np.floor(scaled) - 0.5) < _tie_tolerance
+    for index in np.flatnonzero(near_tie & np.isfinite(values)):
+        rounded[index] = round(float(values[index]), 2)
+
+    return rounded
+
+
+def calculate_calories_bulk(activity_types, durations, weights, met_table=None):
+    """
+    Estimate calories burned for columns of activities using MET formula.
+
+    Same result as Activity.calculate_calories() for each row,
+    NaN where the scalar path returns None.
+    MET table is resolved once per call unless given.
+    """
+    if met_table is None:
+        met_table = ActivityType.met_table()
+
+    activity_types = np.asarray(activity_types, dtype=str)
+    # None becomes NaN, Decimal weights go through float() as in the scalar path
+    durations = np.asarray(durations, dtype=np.float64)
+    weights = np.asarray(weights, dtype=np.float64)
+
+    unique_types, type_index = np.unique(activity_types, return_inverse=True)
+    unique_mets = np.array(
+        [met_table.get(activity_type, np.nan) for activity_type in unique_types],
+        dtype=np.float64
+    )
+    mets = unique_mets[type_index]
+
+    # Same operation order as the scalar path: met * weight * (minutes / 60)
+    with np.errstate(invalid='ignore'):
+        calories = mets * weights * (durations / 60.0)
+
+        invalid = (
+            np.isnan(weights) | (weights == 0)
+            | np.isnan(durations) | (durations <= 0)
+            | np.isnan(mets)
+        )
+
+    calories[invalid] = np.nan
+    return _round_like_python(calories)
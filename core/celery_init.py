@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from celery.signals import celeryd_init, worker_process_shutdown, worker_ready, worker_shutdown
+
+from .metrics import archive_dead_process_metrics, archive_process_metrics
+from .monitoring import flush_counters
+
+logger = logging.getLogger(__name__)
+
+# How often a lane worker checks its concurrency config, s
+lane_concurrency_check_s = 10.0
+# How often the main worker process archives metric files of killed pool processes, s
+metrics_sweep_interval_s = 60.0
+
+# Lane served by this worker, set by configure_lane_concurrency
+_worker_lane = None
+
+
+@worker_process_shutdown.connect(weak=False)
+def flush_worker_process_counters(sender=None, **kwargs):
+    """
+    Write buffered counters of a pool process before it exits
+    and fold its metric files into the archive
+    """
+    flush_counters()
+    archive_process_metrics()
+
+
+@worker_shutdown.connect(weak=False)
+def flush_worker_counters(sender=None, **kwargs):
+    """
+    Write buffered counters of the main worker process (solo/threads pools)
+    """
+    flush_counters()
+
+
+@celeryd_init.connect(weak=False)
+def configure_lane_concurrency(sender=None, conf=None, options=None, **kwargs):
+    """
+    Size the pool of a worker consuming one lane queue (-Q activities.<lane>)
+    from the WORKER_CONCURRENCY_<LANE> realtime config, unless --concurrency is given
+    """
+    global _worker_lane
+
+    import django
+    django.setup()
+    from .lanes import get_lane_concurrency, lane_of_queues
+
+    options = options or {}
+    lane = lane_of_queues(options.get('queues') or [])
+    if lane is None or options.get('concurrency'):
+        return
+
+    _worker_lane = lane
+    conf.worker_concurrency = get_lane_concurrency(_worker_lane)
+    logger.info(f"Worker {sender} serves lane '{_worker_lane}' with concurrency {conf.worker_concurrency}")
+
+
+def _follow_lane_concurrency(app, hostname, lane, applied):
+    from .lanes import get_lane_concurrency
+
+    while True:
+        time.sleep(lane_concurrency_check_s)
+        try:
+            desired = get_lane_concurrency(lane)
+            if desired == applied:
+                continue
+            # Same path as `celery control pool_grow/pool_shrink`, run by the consumer itself
+            if desired > applied:
+                app.control.pool_grow(desired - applied, destination=[hostname])
+            else:
+                app.control.pool_shrink(applied - desired, destination=[hostname])
+            logger.info(f"Lane '{lane}' concurrency of {hostname}: {applied} -> {desired}")
+            applied = desired
+        except Exception as e:
+            logger.warning(f"Failed to apply lane '{lane}' concurrency: {e}")
+
+
+def _sweep_dead_process_metrics():
+    while True:
+        time.sleep(metrics_sweep_interval_s)
+        try:
+            archive_dead_process_metrics()
+        except Exception as e:
+            logger.warning(f"Failed to archive metrics of exited processes: {e}")
+
+
+@worker_ready.connect(weak=False)
+def start_metrics_sweeper(sender=None, **kwargs):
+    """
+    Pool processes killed by SIGKILL or OOM skip worker_process_shutdown,
+    the main process folds their metric files into the archive
+    """
+    threading.Thread(target=_sweep_dead_process_metrics, daemon=True).start()
+
+
+@worker_ready.connect(weak=False)
+def start_lane_concurrency_follower(sender=None, **kwargs):
+    """
+    Resize the pool of a lane worker when its concurrency config changes
+    """
+    if _worker_lane is None or sender is None:
+        return
+
+    threading.Thread(
+        target=_follow_lane_concurrency,
+        args=(sender.app, sender.hostname, _worker_lane, sender.pool.num_processes),
+        daemon=True
+    ).start()
@@ -0,0 +1,109 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .enums import ProcessingStatus
+from .models import Activity
+from .monitoring import increment_counter
+from .signals import activity_status_changed
+
+
+logger = logging.getLogger(__name__)
+
+# PROCESSING activities not updated for this long were abandoned by a killed worker
+# and may be claimed again, longer than the Celery hard time limit, s
+stale_processing_s = getattr(settings, 'CELERY_TASK_TIME_LIMIT', 30 * 60) + 60
+
+# Statuses an activity can be claimed from, besides stale PROCESSING
+CLAIMABLE_STATUSES = (ProcessingStatus.PENDING, ProcessingStatus.FAILED)
+
+
+def claimable_filter(now=None):
+    now = now or timezone.now()
+    return (
+        Q(status__in=CLAIMABLE_STATUSES)
+        | Q(status=ProcessingStatus.PROCESSING, updated_at__lt=now - timezone.timedelta(seconds=stale_processing_s))
+    )
+
+
+def claim_activities(activity_ids, task_id=None):
+    """
+    Mark activities PROCESSING for the caller, so duplicates of a dispatch process each activity once.
+    Rows are locked with SKIP LOCKED and only PENDING, FAILED or stale PROCESSING ones are taken:
+    a row another worker is claiming or has claimed is left to it.
+    Return (claimed activities, ids not found).
+    """
+    activity_ids = list(dict.fromkeys(activity_ids))
+    now = timezone.now()
+
+    with transaction.atomic():
+        activities = list(
+            Activity.objects
+            .select_for_update(skip_locked=True)
+            .filter(claimable_filter(now), id__in=activity_ids)
+            .order_by('id')
+        )
+        if activities:
+            update_fields = {'status': ProcessingStatus.PROCESSING, 'updated_at': now}
+            if task_id:
+                update_fields['celery_task_id'] = task_id
+            Activity.objects.filter(id__in=[activity.id for activity in activities]).update(**update_fields)
+
+            previous_statuses = [activity.status for activity in activities]
+            for activity in activities:
+                activity.status = ProcessingStatus.PROCESSING
+                activity.updated_at = now
+                if task_id:
+                    activity.celery_task_id = task_id
+            activity_status_changed.send(
+                sender=Activity, activities=activities, previous_statuses=previous_statuses
+            )
+
+    claimed_ids = {activity.id for activity in activities}
+    unclaimed_ids = [activity_id for activity_id in activity_ids if activity_id not in claimed_ids]
+    if not unclaimed_ids:
+        return activities, []
+
+    existing_ids = set(Activity.objects.filter(id__in=unclaimed_ids).values_list('id', flat=True))
+    missing_ids = [activity_id for activity_id in unclaimed_ids if activity_id not in existing_ids]
+    duplicate_count = len(unclaimed_ids) - len(missing_ids)
+    if duplicate_count:
+        logger.info("Skipped %d activities already claimed or finished", duplicate_count)
+        increment_counter('duplicates_avoided', duplicate_count)
+    return activities, missing_ids
+
+
+def fail_claimed_activities(activities, error_msg, task_id=None):
+    """
+    Mark activities claimed by the caller FAILED with one UPDATE, so a retry or requeue claims them again
+    instead of waiting for them to turn stale. Rows no longer PROCESSING, or claimed by another task, are kept.
+    """
+    now = timezone.now()
+    claimed = Activity.objects.filter(
+        id__in=[activity.id for activity in activities], status=ProcessingStatus.PROCESSING
+    )
+    if task_id:
+        claimed = claimed.filter(celery_task_id=task_id)
+
+    with transaction.atomic():
+        failed_ids = set(claimed.select_for_update().values_list('id', flat=True))
+        failed = [activity for activity in activities if activity.id in failed_ids]
+        if not failed:
+            return []
+        Activity.objects.filter(id__in=failed_ids).update(
+            status=ProcessingStatus.FAILED, calories_burned=None, error_message=error_msg,
+            processed_at=now, updated_at=now
+        )
+        for activity in failed:
+            activity.status = ProcessingStatus.FAILED
+            activity.calories_burned = None
+            activity.error_message = error_msg
+            activity.processed_at = now
+            activity.updated_at = now
+        activity_status_changed.send(
+            sender=Activity, activities=failed, previous_statuses=[ProcessingStatus.PROCESSING] * len(failed)
+        )
+    return failed
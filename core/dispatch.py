@@ -0,0 +1,42 @@
+import logging
+
+from .enums import ProcessingLane
+from .lanes import lane_queue
+
+from realtime_config.realtime_config import get_config
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_batch_size():
+    """
+    Realtime config for activities per process_activities_batch message.
+    """
+    return max(1, int(get_config('ACTIVITY_BATCH_SIZE', 50)))
+
+
+def dispatch_in_batches(activity_ids, batch_size=None, lane=ProcessingLane.INTERACTIVE):
+    """
+    Queue process_activities_batch for activity ids on the queue of lane,
+    batch_size ids per message, all published over one broker connection.
+    Return list of task results.
+    """
+    from .tasks import process_activities_batch
+
+    batch_size = batch_size or get_batch_size()
+    queue = lane_queue(lane)
+    activity_ids = list(activity_ids)
+    if not activity_ids:
+        return []
+
+    results = []
+    with process_activities_batch.app.producer_or_acquire() as producer:
+        for start in range(0, len(activity_ids), batch_size):
+            chunk = activity_ids[start:start + batch_size]
+            results.append(
+                process_activities_batch.apply_async((chunk,), queue=queue, producer=producer)
+            )
+            logger.info("Queued batch of %d activities to '%s' with task %s", len(chunk), queue, results[-1].id)
+    return results
+
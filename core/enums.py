@@ -80,6 +80,11 @@ class ActivityType:
         # Get MET value from realtime config with fallback to default
         met_value = get_config(config_key, cls._DEFAULT_MET_VALUES.get(value, 1.0))
         return float(met_value)
+
+    @classmethod
+    def met_table(cls) -> dict[str, float]:
+        """Return MET values for all activity values, resolved once"""
+        return {value: cls.get_met(value) for value in cls._ALL_VALUES}
     
 # Choices for status field in Activity model
 class ProcessingStatus(models.TextChoices):
@@ -87,3 +92,9 @@ class ProcessingStatus(models.TextChoices):
     PROCESSING = 'PROCESSING', 'Processing'
     COMPLETED = 'COMPLETED', 'Completed'
     FAILED = 'FAILED', 'Failed'
+
+# Processing lanes, in priority order: each has its own queue and workers
+class ProcessingLane(models.TextChoices):
+    INTERACTIVE = 'interactive', 'Interactive'
+    RETRY = 'retry', 'Retry'
+    BULK = 'bulk', 'Bulk'
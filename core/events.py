@@ -0,0 +1,123 @@
+import asyncio
+import json
+import logging
+
+import redis
+import redis.asyncio as aioredis
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import receiver
+
+from .signals import activity_status_changed
+
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+# Events buffered per connected client before it is considered too slow
+subscriber_queue_size = 256
+
+
+def get_channel_name():
+    return getattr(settings, 'ACTIVITY_STATUS_CHANNEL', 'activity_status_updates')
+
+
+def publish_status_events(payloads):
+    """
+    Publish status payloads to Redis channel in one pipelined round trip.
+    Never raises, status updates must not fail because of notifications.
+    """
+    if not payloads:
+        return
+    channel_name = get_channel_name()
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for payload in payloads:
+            pipe.publish(channel_name, json.dumps(payload))
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Failed to publish {len(payloads)} status events: {e}")
+
+
+@receiver(activity_status_changed, dispatch_uid='publish_activity_status_events')
+def activity_status_changed_handler(sender, activities, **kwargs):
+    """
+    Publish status transitions once the transaction that made them commits.
+    """
+    payloads = [activity.status_payload() for activity in activities]
+    transaction.on_commit(lambda: publish_status_events(payloads))
+
+
+class StatusBroadcaster:
+    """
+    One Redis subscription per process, fanned out to every connected client.
+    Each client gets its own queue, a client that falls behind is disconnected
+    and reconnects with a fresh snapshot.
+    """
+
+    def __init__(self):
+        self._subscribers = set()
+        self._listener = None
+        self._loop = None
+
+    def subscribe(self):
+        self._ensure_listener()
+        queue = asyncio.Queue(maxsize=subscriber_queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def _ensure_listener(self):
+        loop = asyncio.get_running_loop()
+        if self._listener is None or self._listener.done() or self._loop is not loop:
+            self._loop = loop
+            self._listener = loop.create_task(self._listen())
+
+    async def _listen(self):
+        channel_name = get_channel_name()
+        retry_interval = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+
+        while True:
+            client = None
+            try:
+                client = aioredis.Redis.from_url(settings.CELERY_BROKER_URL)
+                async with client.pubsub(ignore_subscribe_messages=True) as pubsub:
+                    await pubsub.subscribe(channel_name)
+                    logger.info(f"Status stream subscribed to Redis channel '{channel_name}'")
+
+                    async for message in pubsub.listen():
+                        if message.get('type') != 'message':
+                            continue
+                        try:
+                            event = json.loads(message['data'])
+                        except (TypeError, ValueError):
+                            logger.warning(f"Invalid status event: {message['data']!r}")
+                            continue
+                        self._fan_out(event)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Status stream listener error: {e}. "
+                               f"Retrying in {retry_interval} seconds...")
+                await asyncio.sleep(retry_interval)
+            finally:
+                if client is not None:
+                    await client.aclose()
+
+    def _fan_out(self, event):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait(event)
+            except asyncio.QueueFull:
+                # Slow client, close its stream so it reconnects and resyncs
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+
+broadcaster = StatusBroadcaster()
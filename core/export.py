@@ -0,0 +1,127 @@
+import csv
+import io
+import json
+import zlib
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.utils import timezone
+
+from .enums import ActivityType, ProcessingStatus
+from .models import Activity
+
+
+# Rows fetched from the server-side cursor at once
+export_chunk_size = 2000
+# Rows encoded into one yielded block
+export_block_rows = 1000
+
+EXPORT_FIELDS = (
+    'id', 'activity_type', 'duration_minutes', 'weight_kg', 'notes',
+    'status', 'calories_burned', 'error_message', 'created_at', 'processed_at',
+)
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def build_export_queryset(date_from=None, date_to=None, status=None, activity_type=None):
+    """
+    Filtered activities as value tuples of EXPORT_FIELDS, in id order.
+    date_from, date_to: inclusive dates of created_at.
+    Raise ValueError on invalid filters.
+    """
+    activities = Activity.objects.all()
+
+    if date_from:
+        date_from = date.fromisoformat(str(date_from))
+        activities = activities.filter(
+            created_at__gte=timezone.make_aware(datetime.combine(date_from, dt_time.min))
+        )
+    if date_to:
+        date_to = date.fromisoformat(str(date_to))
+        activities = activities.filter(
+            created_at__lt=timezone.make_aware(datetime.combine(date_to + timedelta(days=1), dt_time.min))
+        )
+    if status:
+        if status not in ProcessingStatus.values:
+            raise ValueError(f"Invalid status: {status}")
+        activities = activities.filter(status=status)
+    if activity_type:
+        activities = activities.filter(activity_type=ActivityType.validate(activity_type))
+
+    return activities.order_by('id').values_list(*EXPORT_FIELDS)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    # Decimal
+    return str(value)
+
+
+def _encode_csv(rows, buffer, writer):
+    buffer.seek(0)
+    buffer.truncate()
+    writer.writerows(
+        [value.isoformat() if isinstance(value, datetime) else value for value in row]
+        for row in rows
+    )
+    return buffer.getvalue().encode()
+
+
+def _encode_ndjson(rows):
+    return ''.join(
+        json.dumps(dict(zip(EXPORT_FIELDS, row)), default=_json_default) + '\n'
+        for row in rows
+    ).encode()
+
+
+def export_blocks(queryset, fmt='csv', compress=False, chunk_size=export_chunk_size, progress=None):
+    """
+    Yield encoded blocks of the export, gzip compressed on the fly if compress.
+    Rows come from a server-side cursor (.iterator) and are encoded export_block_rows at a time,
+    so memory doesn't depend on the number of rows.
+    progress: called with the number of rows written so far after each block.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Invalid format: {fmt}")
+
+    compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16) if compress else None
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def output(data):
+        return compressor.compress(data) if compressor else data
+
+    if fmt == 'csv':
+        buffer.write(','.join(EXPORT_FIELDS) + '\r\n')
+        yield output(buffer.getvalue().encode())
+
+    row_count = 0
+    block = []
+    for row in queryset.iterator(chunk_size=chunk_size):
+        block.append(row)
+        if len(block) < export_block_rows:
+            continue
+
+        data = _encode_csv(block, buffer, writer) if fmt == 'csv' else _encode_ndjson(block)
+        row_count += len(block)
+        block = []
+        encoded = output(data)
+        if encoded:
+            yield encoded
+        if progress:
+            progress(row_count)
+
+    if block:
+        data = _encode_csv(block, buffer, writer) if fmt == 'csv' else _encode_ndjson(block)
+        row_count += len(block)
+        yield output(data)
+        if progress:
+            progress(row_count)
+
+    if compressor:
+        yield compressor.flush()
+
+
+def export_filename(fmt, compress):
+    name = f"activities-{timezone.now():%Y%m%d-%H%M%S}.{fmt}"
+    return f"{name}.gz" if compress else name
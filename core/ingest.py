@@ -0,0 +1,183 @@
+import csv
+import io
+import json
+import logging
+
+from django.core.exceptions import ValidationError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .enums import ProcessingLane, ProcessingStatus
+from .forms import ActivityForm
+from .models import Activity
+from .outbox import enqueue_for_processing
+from .status_counts import adjust_status_counts
+
+
+logger = logging.getLogger(__name__)
+
+# Rows inserted per transaction
+ingest_chunk_size = 5000
+# Invalid rows reported back in detail, the rest only counted
+max_reported_errors = 100
+
+INGEST_FIELDS = ('activity_type', 'duration_minutes', 'weight_kg', 'notes')
+
+
+class RowValidator:
+    """
+    Validates plain dict rows the way ActivityForm validates a post:
+    same form fields and clean_<field> methods, but one form instance for all rows.
+    """
+
+    def __init__(self):
+        self._form = ActivityForm()
+        self._fields = [
+            (name, field, getattr(self._form, f"clean_{name}", None))
+            for name, field in self._form.fields.items()
+        ]
+
+    def validate(self, row):
+        """
+        Return (cleaned row, None) or (None, {field: [messages]}).
+        """
+        if not isinstance(row, dict):
+            return None, {'__all__': ["Row must be an object"]}
+
+        cleaned = {}
+        errors = {}
+        # clean_<field> methods read form.cleaned_data
+        self._form.cleaned_data = cleaned
+        for name, field, clean_method in self._fields:
+            try:
+                cleaned[name] = field.clean(row.get(name))
+                if clean_method is not None:
+                    cleaned[name] = clean_method()
+            except ValidationError as e:
+                errors[name] = e.messages
+                cleaned.pop(name, None)
+
+        if errors:
+            return None, errors
+        return cleaned, None
+
+
+def parse_rows(body, content_type=''):
+    """
+    Yield rows of a JSON array, {"activities": [...]} object or NDJSON body.
+    Raise ValueError on malformed input.
+    """
+    if isinstance(body, bytes):
+        body = body.decode('utf-8')
+
+    if 'ndjson' in content_type or 'jsonl' in content_type:
+        for line_number, line in enumerate(body.splitlines(), start=1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {line_number}: {e}") from e
+        return
+
+    data = json.loads(body)
+    if isinstance(data, dict):
+        data = data.get('activities')
+    if not isinstance(data, list):
+        raise ValueError("Expected a list of activities")
+    yield from data
+
+
+def _insert_with_copy(rows, now):
+    """
+    COPY rows into a temporary table, then move them with one INSERT ... RETURNING id.
+    Postgres only, must run inside a transaction.
+    """
+    buffer = io.StringIO()
+    # Quoted strings keep empty notes '' as the form saves them, unquoted empty would be NULL
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for row in rows:
+        writer.writerow([row[name] for name in INGEST_FIELDS])
+    buffer.seek(0)
+
+    table = Activity._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "CREATE TEMPORARY TABLE IF NOT EXISTS activity_ingest ("
+            "activity_type varchar(10), duration_minutes integer, "
+            "weight_kg numeric(5, 2), notes text) ON COMMIT DROP"
+        )
+        cursor.copy_expert(
+            "COPY activity_ingest (activity_type, duration_minutes, weight_kg, notes) "
+            "FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+        cursor.execute(
+            f"INSERT INTO {table} "
+            "(activity_type, duration_minutes, weight_kg, notes, created_at, updated_at, status) "
+            "SELECT activity_type, duration_minutes, weight_kg, notes, %s, %s, %s "
+            "FROM activity_ingest RETURNING id",
+            [now, now, ProcessingStatus.PENDING]
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+        cursor.execute("TRUNCATE activity_ingest")
+    return ids
+
+
+def insert_activities(rows, use_copy=None):
+    """
+    Insert cleaned rows as PENDING activities in one transaction, return their ids.
+    Postgres uses COPY, other databases bulk_create.
+    """
+    if use_copy is None:
+        use_copy = connection.vendor == 'postgresql'
+    now = timezone.now()
+
+    if use_copy:
+        return _insert_with_copy(rows, now)
+
+    activities = [
+        Activity(status=ProcessingStatus.PENDING, created_at=now, updated_at=now,
+                 **{name: row[name] for name in INGEST_FIELDS})
+        for row in rows
+    ]
+    Activity.objects.bulk_create(activities, batch_size=1000)
+    return [activity.id for activity in activities]
+
+
+def ingest_activities(rows, chunk_size=ingest_chunk_size, enqueue=True):
+    """
+    Validate and insert rows in chunks, each chunk in its own transaction
+    together with its outbox messages, the relay queues them in batches on the bulk lane.
+    Return {'created': n, 'invalid': n, 'errors': [{'row': index, 'errors': {...}}]}.
+    """
+    validator = RowValidator()
+    result = {'created': 0, 'invalid': 0, 'errors': []}
+    chunk = []
+
+    def insert_chunk():
+        with transaction.atomic():
+            ids = insert_activities(chunk)
+            # bulk_create and COPY don't send post_save
+            adjust_status_counts({ProcessingStatus.PENDING: len(ids)})
+            if enqueue:
+                enqueue_for_processing(ids, lane=ProcessingLane.BULK)
+        result['created'] += len(ids)
+        logger.info(f"Ingested {len(ids)} activities, {result['created']} so far")
+
+    for index, row in enumerate(rows):
+        cleaned, errors = validator.validate(row)
+        if errors:
+            result['invalid'] += 1
+            if len(result['errors']) < max_reported_errors:
+                result['errors'].append({'row': index, 'errors': errors})
+            continue
+
+        chunk.append(cleaned)
+        if len(chunk) >= chunk_size:
+            insert_chunk()
+            chunk = []
+
+    if chunk:
+        insert_chunk()
+    return result
@@ -0,0 +1,101 @@
+import logging
+
+import redis
+from django.conf import settings
+
+from .enums import ProcessingLane
+from .metrics import QUEUE_DEPTH
+
+from realtime_config.realtime_config import get_config
+
+
+logger = logging.getLogger(__name__)
+
+# Prefix of the Celery queue of every lane: activities.interactive, activities.retry, activities.bulk
+queue_prefix = 'activities'
+
+# Lane -> realtime config with the worker concurrency of that lane
+LANE_CONCURRENCY_CONFIGS = {
+    ProcessingLane.INTERACTIVE: 'WORKER_CONCURRENCY_INTERACTIVE',
+    ProcessingLane.RETRY: 'WORKER_CONCURRENCY_RETRY',
+    ProcessingLane.BULK: 'WORKER_CONCURRENCY_BULK',
+}
+
+_redis_client = None
+
+
+def validate_lane(lane):
+    if lane not in ProcessingLane.values:
+        raise ValueError(f"Unknown processing lane: {lane}. Valid: {', '.join(ProcessingLane.values)}")
+    return lane
+
+
+def lane_queue(lane):
+    """
+    Celery queue of a lane.
+    """
+    return f"{queue_prefix}.{validate_lane(lane)}"
+
+
+def async_lane_queue(lane):
+    """
+    Redis list of a lane for the asyncio backend.
+    """
+    queue_name = getattr(settings, 'ACTIVITY_ASYNC_QUEUE', 'activities:async')
+    return f"{queue_name}:{validate_lane(lane)}"
+
+
+def lane_of_queues(queues):
+    """
+    Lane served by a worker consuming queues, None unless it is exactly one lane queue.
+    """
+    if isinstance(queues, str):
+        queues = queues.split(',')
+    lanes = [lane for lane in ProcessingLane.values if lane_queue(lane) in queues]
+    return lanes[0] if len(lanes) == 1 else None
+
+
+def get_lane_concurrency(lane):
+    """
+    Realtime config for worker processes of a lane.
+    """
+    return max(1, int(get_config(LANE_CONCURRENCY_CONFIGS[validate_lane(lane)], 2)))
+
+
+def _get_redis_client():
+    global _redis_client
+    if _redis_client is None:
+        _redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+    return _redis_client
+
+
+def get_queue_depths():
+    """
+    Messages waiting per lane with one pipelined LLEN per queue.
+    Return {'celery': {lane: depth}, 'asyncio': {lane: depth}}, Celery depths count
+    batch messages, asyncio depths count activities.
+    """
+    lanes = ProcessingLane.values
+    pipe = _get_redis_client().pipeline(transaction=False)
+    for lane in lanes:
+        pipe.llen(lane_queue(lane))
+    for lane in lanes:
+        pipe.llen(async_lane_queue(lane))
+    depths = pipe.execute()
+
+    return {
+        'celery': dict(zip(lanes, depths[:len(lanes)])),
+        'asyncio': dict(zip(lanes, depths[len(lanes):])),
+    }
+
+
+def record_queue_depths():
+    """
+    Read queue depths and set the activity_queue_depth gauge per lane and backend.
+    Return the depths like get_queue_depths.
+    """
+    depths = get_queue_depths()
+    for backend, lane_depths in depths.items():
+        for lane, depth in lane_depths.items():
+            QUEUE_DEPTH.labels(lane=lane, backend=backend).set(depth)
+    return depths
@@ -0,0 +1,50 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import status_counts
+from core.partitions import add_months, archive_before, month_start
+
+
+class Command(BaseCommand):
+    help = "Move activities older than a given month into the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--before', metavar='YYYY-MM',
+            help="Archive activities created before this month (default: keep the last 6 months)"
+        )
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Also archive months with pending, processing or failed activities"
+        )
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = date.fromisoformat(f"{options['before']}-01")
+            except ValueError:
+                raise CommandError(f"Invalid month: {options['before']}")
+        else:
+            cutoff = add_months(month_start(timezone.localdate()), -6)
+
+        start_time = time.time()
+        results = archive_before(cutoff, force=options['force'])
+
+        archived = 0
+        for name, count in results.items():
+            if count is None:
+                self.stdout.write(self.style.WARNING(f"Skipped {name}, it has unfinished activities"))
+            else:
+                archived += count
+                self.stdout.write(f"Archived {count} activities from {name}")
+
+        # Dropped partitions bypass the delete signals
+        status_counts.reconcile_status_counts()
+
+        duration = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f"Archived {archived} activities created before {cutoff:%Y-%m} in {duration:.2f}s"
+        ))
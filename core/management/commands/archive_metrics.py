@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from core.metrics import archive_dead_process_metrics, get_multiproc_dir
+
+
+class Command(BaseCommand):
+    help = "Fold metric files of exited processes of this service into its archive files"
+
+    def handle(self, *args, **options):
+        path = get_multiproc_dir()
+        if not path:
+            self.stdout.write(self.style.WARNING("PROMETHEUS_MULTIPROC_DIR isn't set, nothing to do"))
+            return
+
+        pids = archive_dead_process_metrics(path)
+        self.stdout.write(self.style.SUCCESS(f"Archived metrics of {len(pids)} exited processes in {path}"))
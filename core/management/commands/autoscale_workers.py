@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from core.autoscale import LaneAutoscaler, autoscale_interval_s, scale_down_delay_s
+
+
+class Command(BaseCommand):
+    help = "Resize lane worker pools from queue depths and batch processing time"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=autoscale_interval_s,
+            help=f"Seconds between samples (default {autoscale_interval_s})"
+        )
+        parser.add_argument(
+            '--scale-down-delay', type=float, default=scale_down_delay_s,
+            help=f"Seconds a lane must want fewer processes before shrinking (default {scale_down_delay_s})"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Take one sample and exit"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Autoscaling lane workers...")
+        LaneAutoscaler(
+            interval_s=options['interval'],
+            scale_down_delay_s=options['scale_down_delay']
+        ).run(once=options['once'])
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.rollups import backfill_chunk_size, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Rebuild daily and weekly calorie rollups from completed activities"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=backfill_chunk_size,
+            help=f"Activities read per query (default {backfill_chunk_size})"
+        )
+
+    def handle(self, *args, **options):
+        start_time = time.time()
+
+        def progress(read_count, last_id):
+            self.stdout.write(f"Read {read_count} activities, up to id {last_id}")
+
+        rollup_count = rebuild_rollups(chunk_size=options['chunk_size'], progress=progress)
+
+        duration = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {rollup_count} rollup rows in {duration:.2f}s"
+        ))
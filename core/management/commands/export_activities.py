@@ -0,0 +1,80 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.enums import ActivityType, ProcessingStatus
+from core.export import (
+    build_export_queryset, export_blocks, export_chunk_size, EXPORT_FORMATS
+)
+
+
+class Command(BaseCommand):
+    help = "Export activities as CSV or NDJSON with constant memory"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--output', '-o', default='-',
+            help="File to write, - for stdout (default)"
+        )
+        parser.add_argument(
+            '--format', default='csv', choices=EXPORT_FORMATS,
+            help="Output format (default csv)"
+        )
+        parser.add_argument(
+            '--gzip', action='store_true',
+            help="Compress output with gzip"
+        )
+        parser.add_argument('--from', dest='date_from', help="First creation date, YYYY-MM-DD")
+        parser.add_argument('--to', dest='date_to', help="Last creation date, YYYY-MM-DD")
+        parser.add_argument('--status', choices=ProcessingStatus.values)
+        parser.add_argument('--type', dest='activity_type', choices=ActivityType._ALL_VALUES)
+        parser.add_argument(
+            '--chunk-size', type=int, default=export_chunk_size,
+            help=f"Rows fetched from the database cursor at once (default {export_chunk_size})"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            queryset = build_export_queryset(
+                date_from=options['date_from'],
+                date_to=options['date_to'],
+                status=options['status'],
+                activity_type=options['activity_type'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        to_stdout = options['output'] == '-'
+        output = sys.stdout.buffer if to_stdout else open(options['output'], 'wb')
+        # Progress goes to stderr, stdout may be the export itself
+        progress = None if to_stdout else (
+            lambda row_count: self.stderr.write(f"Exported {row_count} rows", ending='\r')
+        )
+
+        start_time = time.time()
+        row_count = 0
+
+        def count(rows):
+            nonlocal row_count
+            row_count = rows
+            if progress:
+                progress(rows)
+
+        try:
+            for block in export_blocks(
+                queryset, options['format'], options['gzip'],
+                chunk_size=options['chunk_size'], progress=count
+            ):
+                output.write(block)
+        finally:
+            if to_stdout:
+                output.flush()
+            else:
+                output.close()
+
+        duration = time.time() - start_time
+        self.stderr.write(self.style.SUCCESS(
+            f"Exported {row_count} activities in {duration:.2f}s "
+            f"({row_count / max(duration, 1e-9):.0f} rows/s)"
+        ))
@@ -0,0 +1,53 @@
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.ingest import ingest_activities, ingest_chunk_size, parse_rows
+
+
+class Command(BaseCommand):
+    help = "Create activities from a JSON array or NDJSON file and queue them for processing"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path',
+            help="File to read, - for NDJSON on stdin. NDJSON if it ends with .ndjson or .jsonl"
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=ingest_chunk_size,
+            help=f"Rows inserted per transaction (default {ingest_chunk_size})"
+        )
+        parser.add_argument(
+            '--no-enqueue', action='store_true',
+            help="Only insert, leave processing to the requeue task"
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        is_ndjson = path == '-' or path.endswith(('.ndjson', '.jsonl'))
+        content_type = 'application/x-ndjson' if is_ndjson else 'application/json'
+
+        start_time = time.time()
+        try:
+            if path == '-':
+                body = sys.stdin.read()
+            else:
+                with open(path, encoding='utf-8') as f:
+                    body = f.read()
+            rows = parse_rows(body, content_type)
+            result = ingest_activities(
+                rows, chunk_size=options['chunk_size'], enqueue=not options['no_enqueue']
+            )
+        except (OSError, ValueError) as e:
+            raise CommandError(str(e))
+
+        for error in result['errors']:
+            self.stderr.write(f"Row {error['row']}: {json.dumps(error['errors'])}")
+
+        duration = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']} activities, {result['invalid']} invalid rows, "
+            f"in {duration:.2f}s ({result['created'] / max(duration, 1e-9):.0f} rows/s)"
+        ))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from core.partitions import ensure_partitions, is_partitioned, list_partitions, partition_months_ahead
+
+
+class Command(BaseCommand):
+    help = "Create upcoming monthly partitions of the activity table and list existing ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months-ahead', type=int, default=partition_months_ahead,
+            help=f"Months after the current one to create (default {partition_months_ahead})"
+        )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            self.stdout.write(self.style.WARNING(
+                "Activity table isn't partitioned (Postgres migration 0006 required), nothing to do"
+            ))
+            return
+
+        created = ensure_partitions(months_ahead=options['months_ahead'])
+        for name in created:
+            self.stdout.write(f"Created {name}")
+
+        partitions = list_partitions()
+        self.stdout.write(self.style.SUCCESS(
+            f"{len(partitions)} monthly partitions, "
+            f"{partitions[0][0]:%Y-%m} to {partitions[-1][0]:%Y-%m}" if partitions
+            else "No monthly partitions"
+        ))
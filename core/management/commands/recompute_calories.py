@@ -0,0 +1,83 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.calories import calculate_calories_bulk
+from core.enums import ActivityType, ProcessingStatus
+from core.models import Activity
+from core.status_cache import invalidate_status_payloads
+
+
+class Command(BaseCommand):
+    help = "Recompute calories burned for processed activities with current MET values"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=5000,
+            help="Rows read and written per query (default 5000)"
+        )
+        parser.add_argument(
+            '--status', default=ProcessingStatus.COMPLETED,
+            choices=ProcessingStatus.values,
+            help="Only recompute activities with this status (default COMPLETED)"
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Compute without writing results"
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        # Resolve MET values once for the whole run
+        met_table = ActivityType.met_table()
+        self.stdout.write(f"Using MET values: {met_table}")
+
+        start_time = time.time()
+        last_id = 0
+        updated_count = 0
+        skipped_count = 0
+
+        while True:
+            # Keyset pagination on id, never loads more than one chunk
+            rows = list(
+                Activity.objects
+                .filter(status=options['status'], id__gt=last_id)
+                .order_by('id')
+                .values_list('id', 'activity_type', 'duration_minutes', 'weight_kg')
+                [:chunk_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+
+            ids, activity_types, durations, weights = zip(*rows)
+            calories = calculate_calories_bulk(
+                activity_types, durations, weights, met_table=met_table
+            )
+
+            valid = ~np.isnan(calories)
+            skipped_count += int((~valid).sum())
+            # updated_at changes too, so status ETags change
+            now = timezone.now()
+            updates = [
+                Activity(id=activity_id, calories_burned=value, updated_at=now)
+                for activity_id, value, is_valid
+                in zip(ids, calories.tolist(), valid.tolist())
+                if is_valid
+            ]
+
+            if not options['dry_run']:
+                Activity.objects.bulk_update(updates, ['calories_burned', 'updated_at'])
+                # bulk_update sends no signals, cached payloads have old calories
+                invalidate_status_payloads([activity.id for activity in updates])
+            updated_count += len(updates)
+
+            self.stdout.write(f"Recomputed {updated_count} activities, up to id {last_id}")
+
+        duration = time.time() - start_time
+        self.stdout.write(self.style.SUCCESS(
+            f"{'Computed' if options['dry_run'] else 'Updated'} {updated_count} activities, "
+            f"skipped {skipped_count} invalid, in {duration:.2f}s"
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core.outbox import relay_batch_limit, relay_poll_interval_s, run_relay
+
+
+class Command(BaseCommand):
+    help = "Send activities recorded in the outbox to the processing backend"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=relay_batch_limit,
+            help=f"Outbox messages relayed per transaction (default {relay_batch_limit})"
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=relay_poll_interval_s,
+            help=f"Seconds to wait when the outbox is empty (default {relay_poll_interval_s})"
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit when the outbox is empty"
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write("Relaying outbox messages...")
+        run_relay(
+            limit=options['batch_size'],
+            poll_interval_s=options['poll_interval'],
+            once=options['once']
+        )
@@ -0,0 +1,28 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.enums import ProcessingLane
+from core.lanes import validate_lane
+from core.pipeline import AsyncActivityWorker
+
+
+class Command(BaseCommand):
+    help = "Process activities of the asyncio backend, many in flight per process"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--lanes', default=','.join(ProcessingLane.values),
+            help=f"Comma separated lanes to consume, highest priority first "
+                 f"(default {','.join(ProcessingLane.values)})"
+        )
+
+    def handle(self, *args, **options):
+        try:
+            lanes = [validate_lane(lane.strip()) for lane in options['lanes'].split(',') if lane.strip()]
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        worker = AsyncActivityWorker(lanes=lanes)
+        asyncio.run(worker.run())
+        self.stdout.write(self.style.SUCCESS("Async worker stopped"))
@@ -0,0 +1,174 @@
+import atexit
+import fcntl
+import glob
+import logging
+import math
+import os
+import re
+from contextlib import ExitStack, contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+from prometheus_client.mmap_dict import MmapedDict
+from prometheus_client.multiprocess import MultiProcessCollector, mark_process_dead
+
+logger = logging.getLogger(__name__)
+
+# Metrics are written directly by the processes doing the work.
+# With PROMETHEUS_MULTIPROC_DIR set, prometheus_client keeps values in mmap files
+# {type}_{pid}.db in that directory, every service gets its own subdirectory
+# of one shared root and the metrics service merges them all on scrape.
+
+# Upper bounds of stage histogram buckets, s
+HISTOGRAM_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, math.inf
+)
+
+TASKS_STARTED = Counter('celery_tasks_started', 'Number of activity processing tasks started')
+TASKS_COMPLETED = Counter('celery_tasks_completed', 'Number of activity processing tasks completed')
+TASKS_FAILED = Counter('celery_tasks_failed', 'Number of activity processing tasks failed')
+CALORIES_BURNED = Counter('celery_calories_burned_total', 'Total calories burned')
+DUPLICATES_AVOIDED = Counter(
+    'activity_duplicates_avoided',
+    'Dispatches of activities skipped because another worker had claimed or finished them'
+)
+
+STAGE_DURATION = Histogram(
+    'activity_stage_duration_seconds',
+    'Duration of activity processing stages',
+    ['stage', 'activity_type'],
+    buckets=HISTOGRAM_BUCKETS
+)
+
+# Set by the autoscaler on every sample, the exporter only reads the mmap file
+QUEUE_DEPTH = Gauge(
+    'activity_queue_depth',
+    'Messages waiting in activity processing queues',
+    ['lane', 'backend'],
+    multiprocess_mode='livemostrecent'
+)
+
+# Redis counter name -> Prometheus counter incremented along with it
+PROMETHEUS_COUNTERS = {
+    'tasks_started': TASKS_STARTED,
+    'tasks_completed': TASKS_COMPLETED,
+    'tasks_failed': TASKS_FAILED,
+    'total_calories': CALORIES_BURNED,
+    'duplicates_avoided': DUPLICATES_AVOIDED,
+}
+
+# Files of exited processes are folded into {type}_archive.db
+ARCHIVED_TYPES = ('counter', 'histogram')
+_lock_file_name = '.archive.lock'
+# {type}_{pid}.db and gauge_{mode}_{pid}.db, not {type}_archive.db
+_pid_file_re = re.compile(r'_(\d+)\.db$')
+
+
+def get_multiproc_dir():
+    return os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+
+
+@contextmanager
+def _dir_lock(path, shared):
+    """
+    flock on the directory's lock file.
+    Archiving takes it exclusive, scrapes shared, so no scrape sees
+    an increment both in the archive and in the file it came from.
+    """
+    with open(os.path.join(path, _lock_file_name), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def archive_process_metrics(pid=None, path=None):
+    """
+    Garbage-collect metric files of an exited process.
+    Live gauges are dropped, counters and histograms are added into archive files,
+    so totals survive while the number of files stays bounded by live processes.
+    """
+    path = path or get_multiproc_dir()
+    if not path or not os.path.isdir(path):
+        return
+    pid = pid or os.getpid()
+
+    try:
+        mark_process_dead(pid, path)
+        with _dir_lock(path, shared=False):
+            for typ in ARCHIVED_TYPES:
+                source = os.path.join(path, f"{typ}_{pid}.db")
+                if not os.path.exists(source):
+                    continue
+
+                archive = MmapedDict(os.path.join(path, f"{typ}_archive.db"))
+                try:
+                    for key, value, timestamp, _ in MmapedDict.read_all_values_from_file(source):
+                        archived_value, _ = archive.read_value(key)
+                        archive.write_value(key, archived_value + value, timestamp)
+                finally:
+                    archive.close()
+                os.remove(source)
+    except OSError as e:
+        logger.warning(f"Failed to archive metrics of process {pid} in {path}: {e}")
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def archive_dead_process_metrics(path=None):
+    """
+    Archive metric files of every process of this directory that is no longer running:
+    killed ones (SIGKILL, OOM) never run archive_process_metrics themselves.
+    Liveness is checked in the caller's PID namespace, so only call it from the service
+    (container) that owns the directory. Return archived pids.
+    """
+    path = path or get_multiproc_dir()
+    if not path or not os.path.isdir(path):
+        return []
+
+    pids = set()
+    for file_path in glob.glob(os.path.join(path, '*.db')):
+        match = _pid_file_re.search(os.path.basename(file_path))
+        if match:
+            pids.add(int(match.group(1)))
+
+    dead_pids = sorted(pid for pid in pids if pid != os.getpid() and not _is_alive(pid))
+    for pid in dead_pids:
+        archive_process_metrics(pid, path)
+    if dead_pids:
+        logger.info(f"Archived metrics of {len(dead_pids)} exited processes in {path}")
+    return dead_pids
+
+
+class MultiProcessTreeCollector:
+    """
+    Merges metric files of every service directory under root, read locally
+    on each scrape.
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def collect(self):
+        paths = sorted(path for path in glob.glob(os.path.join(self.root, '*')) if os.path.isdir(path))
+
+        with ExitStack() as stack:
+            files = []
+            for path in paths:
+                stack.enter_context(_dir_lock(path, shared=True))
+                files.extend(glob.glob(os.path.join(path, '*.db')))
+            return MultiProcessCollector.merge(files, accumulate=True)
+
+
+if get_multiproc_dir():
+    # Celery pool processes exit without atexit, see core/celery_init.py
+    atexit.register(archive_process_metrics)
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='activity',
+            options={'ordering': ['-created_at', '-id'], 'verbose_name': 'Activity Log', 'verbose_name_plural': 'Activity Logs'},
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(fields=['created_at', 'id'], name='activity_created_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='activity',
+            index=models.Index(condition=models.Q(('status__in', ['PENDING', 'FAILED'])), fields=['status', 'created_at'], name='activity_unfinished_idx'),
+        ),
+    ]
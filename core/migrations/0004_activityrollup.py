@@ -0,0 +1,32 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=4, verbose_name='Period')),
+                ('period_start', models.DateField(verbose_name='Period Start')),
+                ('activity_type', models.CharField(choices=[('run', 'Running'), ('walk', 'Walking'), ('cycle', 'Cycling'), ('swim', 'Swimming'), ('yoga', 'Yoga')], max_length=10, verbose_name='Type of Activity')),
+                ('activity_count', models.PositiveBigIntegerField(default=0, verbose_name='Activities')),
+                ('duration_minutes', models.PositiveBigIntegerField(default=0, verbose_name='Duration (minutes)')),
+                ('calories_burned', models.DecimalField(decimal_places=2, default=0, max_digits=16, verbose_name='Calories Burned')),
+            ],
+            options={
+                'verbose_name': 'Activity Rollup',
+                'verbose_name_plural': 'Activity Rollups',
+                'ordering': ['period', 'period_start', 'activity_type'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activityrollup',
+            constraint=models.UniqueConstraint(fields=('period', 'period_start', 'activity_type'), name='activity_rollup_unique_period'),
+        ),
+    ]
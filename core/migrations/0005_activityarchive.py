@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_activityrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityArchive',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='ID')),
+                ('activity_type', models.CharField(choices=[('run', 'Running'), ('walk', 'Walking'), ('cycle', 'Cycling'), ('swim', 'Swimming'), ('yoga', 'Yoga')], max_length=10, verbose_name='Type of Activity')),
+                ('duration_minutes', models.PositiveIntegerField(verbose_name='Duration (minutes)')),
+                ('weight_kg', models.DecimalField(decimal_places=2, max_digits=5, verbose_name='Weight (kg)')),
+                ('notes', models.TextField(blank=True, null=True, verbose_name='Optional Notes')),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('PROCESSING', 'Processing'), ('COMPLETED', 'Completed'), ('FAILED', 'Failed')], max_length=10, verbose_name='Processing Status')),
+                ('calories_burned', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True, verbose_name='Calories Burned')),
+                ('created_at', models.DateTimeField(verbose_name='Logged At')),
+                ('processed_at', models.DateTimeField(blank=True, null=True, verbose_name='Processed At')),
+            ],
+            options={
+                'verbose_name': 'Archived Activity',
+                'verbose_name_plural': 'Archived Activities',
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['created_at', 'id'], name='activity_archive_created_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,96 @@
+"""
+Convert core_activity into a table partitioned by month of created_at (Postgres only).
+
+The primary key of a partitioned table has to include the partition key,
+so it becomes (id, created_at); ids still come from one sequence.
+Rows are copied into the new table in the migration transaction, which holds
+an exclusive lock on core_activity for the duration of the copy.
+No-op on other databases and on an already partitioned table.
+"""
+from datetime import date, datetime, timezone
+
+from django.db import migrations
+
+
+TABLE = 'core_activity'
+NEW_TABLE = 'core_activity_partitioned'
+SEQUENCE = 'core_activity_partitioned_id_seq'
+MONTHS_AHEAD = 3
+
+
+def _add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def _bound(month):
+    return datetime(month.year, month.month, 1, tzinfo=timezone.utc).isoformat()
+
+
+def partition_activity_table(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [TABLE])
+        if cursor.fetchone()[0] == 'p':
+            return
+
+        cursor.execute(
+            f"CREATE TABLE {NEW_TABLE} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS) "
+            "PARTITION BY RANGE (created_at)"
+        )
+        # Identity columns aren't supported on partitioned tables before Postgres 17
+        cursor.execute(f"CREATE SEQUENCE {SEQUENCE} OWNED BY {NEW_TABLE}.id")
+        cursor.execute(f"ALTER TABLE {NEW_TABLE} ALTER COLUMN id SET DEFAULT nextval('{SEQUENCE}')")
+        cursor.execute(f"ALTER TABLE {NEW_TABLE} ADD PRIMARY KEY (id, created_at)")
+
+        # Writes committed to the old table after the copy would be dropped with it:
+        # block them until the migration commits, reads still work
+        cursor.execute(f"LOCK TABLE {TABLE} IN SHARE ROW EXCLUSIVE MODE")
+
+        # Monthly partitions covering existing rows and the next months
+        cursor.execute(f"SELECT min(created_at) FROM {TABLE}")
+        oldest = cursor.fetchone()[0]
+        today = date.today()
+        month = date(oldest.year, oldest.month, 1) if oldest else date(today.year, today.month, 1)
+        last = _add_months(date(today.year, today.month, 1), MONTHS_AHEAD)
+        while month <= last:
+            cursor.execute(
+                f"CREATE TABLE {TABLE}_p{month:%Y%m} PARTITION OF {NEW_TABLE} "
+                "FOR VALUES FROM (%s) TO (%s)",
+                [_bound(month), _bound(_add_months(month, 1))]
+            )
+            month = _add_months(month, 1)
+        # Catches rows beyond the last partition until manage_partitions creates it
+        cursor.execute(f"CREATE TABLE {TABLE}_default PARTITION OF {NEW_TABLE} DEFAULT")
+
+        cursor.execute(f"INSERT INTO {NEW_TABLE} SELECT * FROM {TABLE}")
+        cursor.execute(
+            f"SELECT setval('{SEQUENCE}', COALESCE((SELECT max(id) FROM {NEW_TABLE}), 0) + 1, false)"
+        )
+
+        cursor.execute(f"DROP TABLE {TABLE}")
+        cursor.execute(f"ALTER TABLE {NEW_TABLE} RENAME TO {TABLE}")
+        cursor.execute(f"ALTER SEQUENCE {SEQUENCE} RENAME TO {TABLE}_id_seq")
+
+        # Indexes of the old table, created on every partition
+        cursor.execute(f"CREATE INDEX {TABLE}_status_idx ON {TABLE} (status)")
+        cursor.execute(f"CREATE INDEX activity_created_id_idx ON {TABLE} (created_at, id)")
+        cursor.execute(
+            f"CREATE INDEX activity_unfinished_idx ON {TABLE} (status, created_at) "
+            "WHERE status IN ('PENDING', 'FAILED')"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_activityarchive'),
+    ]
+
+    operations = [
+        # Converting back isn't supported, the partitioned table works with the previous schema
+        migrations.RunPython(partition_activity_table, migrations.RunPython.noop),
+    ]
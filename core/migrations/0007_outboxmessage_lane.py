@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_partition_activity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outboxmessage',
+            name='lane',
+            field=models.CharField(choices=[('interactive', 'Interactive'), ('retry', 'Retry'), ('bulk', 'Bulk')], default='interactive', max_length=16, verbose_name='Processing Lane'),
+        ),
+    ]
@@ -1,7 +1,9 @@
-from django.db import models
+from asgiref.sync import sync_to_async
+from django.db import models, transaction
 
 from django.utils import timezone
-from .enums import ActivityType, ProcessingStatus
+from .enums import ActivityType, ProcessingLane, ProcessingStatus
+from .signals import activity_status_changed
 
 # Create your models here.
 
@@ -107,8 +109,18 @@ class Activity(models.Model):
     class Meta:
         verbose_name = "Activity Log"
         verbose_name_plural = "Activity Logs"
-        # Show newest activities first
-        ordering = ['-created_at']
+        # Show newest activities first, id breaks ties for keyset pagination
+        ordering = ['-created_at', '-id']
+        indexes = [
+            # List pages seek by (created_at, id), see core/pagination.py
+            models.Index(fields=['created_at', 'id'], name='activity_created_id_idx'),
+            # Requeue and pending count only look at unfinished rows
+            models.Index(
+                fields=['status', 'created_at'],
+                name='activity_unfinished_idx',
+                condition=models.Q(status__in=[ProcessingStatus.PENDING, ProcessingStatus.FAILED])
+            ),
+        ]
 
     # Helper Methods
     
@@ -144,6 +156,7 @@ class Activity(models.Model):
         
         # List of fields to update
         update_fields_ = ['status', 'updated_at']
+        previous_status = self.status
         self.status = status
 
         if status == ProcessingStatus.COMPLETED:
@@ -164,7 +177,34 @@ class Activity(models.Model):
         elif status == ProcessingStatus.PROCESSING:
             pass
 
-        self.save(update_fields=update_fields_)
+        # Status and signal receivers in one transaction, their on_commit work runs after it
+        with transaction.atomic():
+            self.save(update_fields=update_fields_)
+
+            activity_status_changed.send(
+                sender=self.__class__, activities=[self], previous_statuses=[previous_status]
+            )
+
+    async def aupdate_status(self, status, calories=None, error_msg=None):
+        """
+        Async version of update_status.
+        Save and signal receivers run in the thread Django uses for async ORM calls.
+        """
+        await sync_to_async(self.update_status)(status, calories=calories, error_msg=error_msg)
+
+    def status_payload(self):
+        """
+        Return status fields for real-time updates, as sent to the page.
+        """
+        return {
+            'id': self.id,
+            'status': self.status,
+            'status_display': self.get_status_display(),
+            'calories': float(self.calories_burned) if self.calories_burned else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None,
+            'error': self.error_message or None,
+            'updated_at': self.updated_at.isoformat(),
+        }
 
     @property
     def is_processed(self) -> bool:
@@ -182,3 +222,167 @@ class Activity(models.Model):
         if self.processed_at and self.created_at:
             return (self.processed_at - self.created_at).total_seconds()
         return None
+
+
+class OutboxMessage(models.Model):
+    """
+    Activity waiting to be queued for processing.
+    Written in the transaction that creates the activity,
+    sent to the broker by the outbox relay (core/outbox.py).
+    """
+
+    activity_id = models.BigIntegerField(
+        verbose_name="Activity ID"
+    )
+
+    lane = models.CharField(
+        max_length=16,
+        choices=ProcessingLane.choices,
+        default=ProcessingLane.INTERACTIVE,
+        verbose_name="Processing Lane"
+    )
+
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name="Created At"
+    )
+
+    class Meta:
+        verbose_name = "Outbox Message"
+        verbose_name_plural = "Outbox Messages"
+        # Relay drains oldest first
+        ordering = ['id']
+
+    def __str__(self):
+        return f"Process activity {self.activity_id}"
+
+
+class ActivityRollup(models.Model):
+    """
+    Totals of completed activities per period and activity type.
+    Incremented when an activity completes (core/rollups.py),
+    rebuilt from history by manage.py backfill_rollups.
+    """
+
+    PERIOD_DAY = 'day'
+    PERIOD_WEEK = 'week'
+    PERIODS = (PERIOD_DAY, PERIOD_WEEK)
+
+    period = models.CharField(
+        max_length=4,
+        choices=[(PERIOD_DAY, 'Day'), (PERIOD_WEEK, 'Week')],
+        verbose_name="Period"
+    )
+
+    # Day, or Monday of the week, of activities' created_at
+    period_start = models.DateField(
+        verbose_name="Period Start"
+    )
+
+    activity_type = models.CharField(
+        max_length=10,
+        choices=ActivityType.choices(),
+        verbose_name="Type of Activity"
+    )
+
+    activity_count = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Activities"
+    )
+
+    duration_minutes = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name="Duration (minutes)"
+    )
+
+    calories_burned = models.DecimalField(
+        max_digits=16,
+        decimal_places=2,
+        default=0,
+        verbose_name="Calories Burned"
+    )
+
+    class Meta:
+        verbose_name = "Activity Rollup"
+        verbose_name_plural = "Activity Rollups"
+        ordering = ['period', 'period_start', 'activity_type']
+        constraints = [
+            # Conflict target of the incremental upsert
+            models.UniqueConstraint(
+                fields=['period', 'period_start', 'activity_type'],
+                name='activity_rollup_unique_period'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{ActivityType.get_label(self.activity_type)} {self.period} of {self.period_start}"
+
+
+class ActivityArchive(models.Model):
+    """
+    Compact copy of old activities moved out of the live table
+    by manage.py archive_activities. Read-only, kept queryable for history.
+    """
+
+    # Same id as the archived activity
+    id = models.BigIntegerField(
+        primary_key=True,
+        verbose_name="ID"
+    )
+
+    activity_type = models.CharField(
+        max_length=10,
+        choices=ActivityType.choices(),
+        verbose_name="Type of Activity"
+    )
+
+    duration_minutes = models.PositiveIntegerField(
+        verbose_name="Duration (minutes)"
+    )
+
+    weight_kg = models.DecimalField(
+        max_digits=5,
+        decimal_places=2,
+        verbose_name="Weight (kg)"
+    )
+
+    notes = models.TextField(
+        blank=True,
+        null=True,
+        verbose_name="Optional Notes"
+    )
+
+    status = models.CharField(
+        max_length=10,
+        choices=ProcessingStatus.choices,
+        verbose_name="Processing Status"
+    )
+
+    calories_burned = models.DecimalField(
+        max_digits=7,
+        decimal_places=2,
+        null=True,
+        blank=True,
+        verbose_name="Calories Burned"
+    )
+
+    created_at = models.DateTimeField(
+        verbose_name="Logged At"
+    )
+
+    processed_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name="Processed At"
+    )
+
+    class Meta:
+        verbose_name = "Archived Activity"
+        verbose_name_plural = "Archived Activities"
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='activity_archive_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"{ActivityType.get_label(self.activity_type)} for {self.duration_minutes} mins ({self.created_at.strftime('%Y-%m-%d')})"
@@ -1,15 +1,209 @@
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
 import redis
 from django.conf import settings
 
+from .metrics import PROMETHEUS_COUNTERS, STAGE_DURATION
+
+logger = logging.getLogger(__name__)
+
 redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
 
+COUNTER_NAMES = ('tasks_started', 'tasks_completed', 'tasks_failed', 'total_calories', 'duplicates_avoided')
+
+# Counters below are kept in Redis for the JSON metrics endpoint,
+# Prometheus counters and histograms are written by each process directly (core/metrics.py)
+
+# Stages of activity processing timed into histograms:
+# queue_wait - created_at to task start, db_load - reading the activity,
+# compute - processing delay and calculation, status_write - status and task id saves,
+# processing_time - created_at to processed_at
+STAGES = ('queue_wait', 'db_load', 'compute', 'status_write', 'processing_time')
+# activity_type label for stages timed once per process_activities_batch
+BATCH_LABEL = 'batch'
+
+# Flush buffered increments when this many are pending...
+counter_flush_size = 100
+# ... or the oldest one waited this long, s
+counter_flush_interval_s = 5.0
+
+
+class CounterBuffer:
+    """
+    Aggregates counter increments in process and writes them to Redis
+    in one MULTI pipeline on flush.
+
+    Flushes when flush_size increments are pending, when the oldest pending one
+    is flush_interval_s old (background thread), and at process shutdown
+    (celery worker signals in core/celery_init.py, atexit otherwise).
+
+    Loss bounds: a process killed without shutdown hooks (SIGKILL, OOM) loses
+    at most flush_size increments or flush_interval_s worth of them.
+    A failed flush keeps the amounts for the next one, so while Redis is down
+    the loss bound grows by the outage.
+    """
+
+    def __init__(self, flush_size=counter_flush_size, flush_interval_s=counter_flush_interval_s):
+        self.flush_size = flush_size
+        self.flush_interval_s = flush_interval_s
+        self._amounts = defaultdict(int)
+        self._pending = 0
+        self._first_added_at = None
+        self._lock = threading.Lock()
+        self._flusher_pid = None
+
+    def add(self, name, amount=1):
+        self.add_many({f"counter:{name}": amount})
+
+    def add_many(self, amounts):
+        """
+        Buffer several increments as one.
+        amounts: {redis key: amount}
+        """
+        amounts = {target: amount for target, amount in amounts.items() if amount}
+        if not amounts:
+            return
+        self._ensure_flusher()
+        with self._lock:
+            if not self._pending:
+                self._first_added_at = time.monotonic()
+            for key, amount in amounts.items():
+                self._amounts[key] += amount
+            self._pending += 1
+            is_due = self._pending >= self.flush_size
+        if is_due:
+            self.flush()
+
+    def flush(self):
+        """
+        Write all buffered increments to Redis in one transaction.
+        """
+        with self._lock:
+            amounts = self._take()
+        if not amounts:
+            return
+
+        try:
+            pipe = redis_client.pipeline(transaction=True)
+            for key, amount in amounts.items():
+                if isinstance(amount, float):
+                    pipe.incrbyfloat(key, amount)
+                else:
+                    pipe.incrby(key, amount)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Failed to flush counters {dict(amounts)}, keeping for next flush: {e}")
+            with self._lock:
+                if not self._pending:
+                    self._first_added_at = time.monotonic()
+                for key, amount in amounts.items():
+                    self._amounts[key] += amount
+                self._pending += 1
 
-def increment_counter(name):
-    return redis_client.incr(f"counter:{name}")
+    def _take(self):
+        amounts = self._amounts
+        self._amounts = defaultdict(int)
+        self._pending = 0
+        self._first_added_at = None
+        return amounts
+
+    def _is_old(self):
+        with self._lock:
+            return self._first_added_at is not None and \
+                time.monotonic() - self._first_added_at >= self.flush_interval_s
+
+    def _ensure_flusher(self):
+        # Threads don't survive fork, start one per process
+        pid = os.getpid()
+        if self._flusher_pid == pid:
+            return
+        with self._lock:
+            if self._flusher_pid == pid:
+                return
+            self._flusher_pid = pid
+            # Buffer copied from the parent belongs to the parent
+            self._take()
+        threading.Thread(target=self._run_flusher, daemon=True, name="CounterFlusher").start()
+
+    def _run_flusher(self):
+        while True:
+            time.sleep(self.flush_interval_s / 2)
+            if self._is_old():
+                self.flush()
+
+
+counter_buffer = CounterBuffer()
+atexit.register(counter_buffer.flush)
+
+
+def flush_counters():
+    counter_buffer.flush()
+
+def _increment_prometheus(name, amount):
+    counter = PROMETHEUS_COUNTERS.get(name)
+    if counter is not None and amount > 0:
+        counter.inc(amount)
+
+def increment_counter(name, amount=1):
+    _increment_prometheus(name, amount)
+    counter_buffer.add(name, amount)
+
+def _parse_counter(value):
+    # total_calories is incremented with INCRBYFLOAT, the rest are integers
+    if not value:
+        return 0
+    value = value.decode()
+    return float(value) if '.' in value or 'e' in value else int(value)
 
 def get_counter(name):
-    value = redis_client.get(f"counter:{name}")
-    return int(value) if value else 0
+    return _parse_counter(redis_client.get(f"counter:{name}"))
+
+def get_counters(names=COUNTER_NAMES):
+    """
+    Read several counters with one MGET.
+    Return {counter name: value}.
+    """
+    values = redis_client.mget([f"counter:{name}" for name in names])
+    return {name: _parse_counter(value) for name, value in zip(names, values)}
 
 def increment_counter_by(name, amount):
-    return redis_client.incrby(f"counter:{name}", amount)
+    _increment_prometheus(name, amount)
+    counter_buffer.add(name, amount)
+
+def increment_counters(amounts):
+    """
+    Increment several counters, flushed together with the rest of the buffer.
+    amounts: {counter name: amount}, zero amounts are skipped.
+    """
+    for name, amount in amounts.items():
+        _increment_prometheus(name, amount)
+    counter_buffer.add_many({
+        f"counter:{name}": amount for name, amount in amounts.items()
+    })
+
+
+def observe_stages(activity_type, durations):
+    """
+    Record stage durations of one activity (or batch) into histograms.
+    durations: {stage: seconds}
+    """
+    for stage, seconds in durations.items():
+        # Clock skew between hosts can make queue wait negative
+        STAGE_DURATION.labels(stage=stage, activity_type=activity_type).observe(max(0.0, seconds))
+
+@contextmanager
+def stage_timer(durations, stage):
+    """
+    Add time spent in the with block to durations[stage].
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        durations[stage] = durations.get(stage, 0.0) + time.perf_counter() - start
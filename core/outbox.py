@@ -0,0 +1,79 @@
+import logging
+import time
+
+from django.db import transaction
+
+from .enums import ProcessingLane
+from .models import OutboxMessage
+from .pipeline import get_backend
+
+
+logger = logging.getLogger(__name__)
+
+# Messages taken from the outbox per relay transaction
+relay_batch_limit = 1000
+# Sleep when the outbox is empty, s
+relay_poll_interval_s = 0.5
+# Sleep after a failed relay, s
+relay_retry_interval_s = 5.0
+
+
+def enqueue_for_processing(activity_ids, lane=ProcessingLane.INTERACTIVE):
+    """
+    Record activities to be queued for processing in lane.
+    Call inside the transaction that creates them, the relay sees them only after commit.
+    """
+    OutboxMessage.objects.bulk_create(
+        [OutboxMessage(activity_id=activity_id, lane=lane) for activity_id in activity_ids]
+    )
+
+
+def relay_batch(limit=relay_batch_limit):
+    """
+    Send up to limit outbox messages to the processing backend and delete them.
+    Rows are locked with SKIP LOCKED, so several relays never take the same message.
+    Delivery is at least once: if the commit fails after publishing, messages are sent again.
+    Return number of messages relayed.
+    """
+    with transaction.atomic():
+        messages = list(
+            OutboxMessage.objects
+            .select_for_update(skip_locked=True)
+            .order_by('id')
+            .values_list('id', 'activity_id', 'lane')[:limit]
+        )
+        if not messages:
+            return 0
+
+        # Duplicates of one activity are coalesced into one dispatch per lane
+        lanes = {}
+        for _, activity_id, lane in messages:
+            lanes.setdefault(lane, {})[activity_id] = None
+        backend = get_backend()
+        for lane, activity_ids in lanes.items():
+            backend.dispatch(activity_ids, lane=lane)
+        OutboxMessage.objects.filter(id__in=[message[0] for message in messages]).delete()
+
+    return len(messages)
+
+
+def run_relay(limit=relay_batch_limit, poll_interval_s=relay_poll_interval_s, once=False):
+    """
+    Drain the outbox until stopped, once=True stops when it is empty.
+    """
+    while True:
+        try:
+            relayed = relay_batch(limit)
+        except Exception as e:
+            logger.error(f"Outbox relay failed: {e}. Retrying in {relay_retry_interval_s} seconds...")
+            if once:
+                raise
+            time.sleep(relay_retry_interval_s)
+            continue
+
+        if relayed:
+            logger.info(f"Relayed {relayed} outbox messages")
+            continue
+        if once:
+            return
+        time.sleep(poll_interval_s)
@@ -0,0 +1,100 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+def encode_cursor(activity):
+    """
+    Opaque cursor of position (created_at, id) in the list.
+    """
+    raw = f"{activity.created_at.isoformat()}|{activity.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Return (created_at, id) of the cursor, None if it's missing or invalid.
+    Cursors without a time zone are invalid, encode_cursor never makes them.
+    """
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        created_at, activity_id = raw.split('|')
+        created_at = datetime.fromisoformat(created_at)
+        activity_id = int(activity_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    # Naive times compare wrongly with aware created_at
+    if created_at.tzinfo is None:
+        return None
+    return created_at, activity_id
+
+
+class CursorPage:
+    """
+    One page of a list ordered by (-created_at, -id), with cursors of its first and last rows.
+    Works like a Django Page in templates: has_next, has_previous, has_other_pages.
+    """
+
+    def __init__(self, object_list, has_next, has_previous):
+        self.object_list = object_list
+        self.has_next_page = has_next
+        self.has_previous_page = has_previous
+
+    def has_next(self):
+        return self.has_next_page
+
+    def has_previous(self):
+        return self.has_previous_page
+
+    def has_other_pages(self):
+        return self.has_next_page or self.has_previous_page
+
+    @property
+    def next_cursor(self):
+        return encode_cursor(self.object_list[-1]) if self.has_next_page and self.object_list else None
+
+    @property
+    def previous_cursor(self):
+        return encode_cursor(self.object_list[0]) if self.has_previous_page and self.object_list else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+def paginate_by_cursor(queryset, per_page, after=None, before=None):
+    """
+    Keyset pagination, newest first. Seeks through the (created_at, id) index,
+    so every page costs the same no matter how deep.
+
+    after: cursor of the last row of previous page, returns older rows
+    before: cursor of the first row of next page, returns newer rows
+    Neither: first page.
+    """
+    after = decode_cursor(after)
+    before = decode_cursor(before) if after is None else None
+
+    if before is not None:
+        created_at, activity_id = before
+        rows = list(
+            queryset.filter(Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=activity_id))
+            .order_by('created_at', 'id')[:per_page + 1]
+        )
+        has_previous = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return CursorPage(rows, has_next=True, has_previous=has_previous)
+
+    if after is not None:
+        created_at, activity_id = after
+        queryset = queryset.filter(Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=activity_id))
+
+    rows = list(queryset.order_by('-created_at', '-id')[:per_page + 1])
+    has_next = len(rows) > per_page
+    return CursorPage(rows[:per_page], has_next=has_next, has_previous=after is not None)
+
@@ -0,0 +1,238 @@
+import logging
+from datetime import date, datetime, timezone as dt_timezone
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .enums import ProcessingStatus
+from .models import Activity, ActivityArchive
+from .status_cache import invalidate_status_payloads
+
+
+logger = logging.getLogger(__name__)
+
+# Monthly partitions created ahead of time
+partition_months_ahead = 3
+# Rows moved per statement when archiving a table that isn't partitioned
+archive_chunk_size = 10000
+
+ARCHIVE_FIELDS = (
+    'id', 'activity_type', 'duration_minutes', 'weight_kg', 'notes',
+    'status', 'calories_burned', 'created_at', 'processed_at',
+)
+
+
+def month_start(day):
+    return date(day.year, day.month, 1)
+
+
+def add_months(day, months):
+    month_index = day.year * 12 + day.month - 1 + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def partition_name(month):
+    return f"{Activity._meta.db_table}_p{month:%Y%m}"
+
+
+def partition_month(name):
+    suffix = name[len(f"{Activity._meta.db_table}_p"):]
+    return date(int(suffix[:4]), int(suffix[4:6]), 1)
+
+
+def default_partition_name():
+    return f"{Activity._meta.db_table}_default"
+
+
+def _bound(month):
+    # Partition bounds in UTC, independent of the session time zone
+    return datetime(month.year, month.month, 1, tzinfo=dt_timezone.utc).isoformat()
+
+
+def is_partitioned():
+    """
+    True if the activity table is a partitioned Postgres table (migration 0006).
+    """
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)",
+            [Activity._meta.db_table]
+        )
+        row = cursor.fetchone()
+    return bool(row) and row[0] == 'p'
+
+
+def list_partitions():
+    """
+    Return [(month, partition name)] of monthly partitions, oldest first.
+    """
+    table = Activity._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = %s",
+            [table]
+        )
+        names = [row[0] for row in cursor.fetchall()]
+
+    partitions = []
+    prefix = f"{table}_p"
+    for name in names:
+        if name.startswith(prefix):
+            partitions.append((partition_month(name), name))
+    return sorted(partitions)
+
+
+def create_partition(month):
+    """
+    Create partition of one month. Rows of that month already in the default partition
+    are moved into it before it is attached. Return True if created.
+    """
+    table = Activity._meta.db_table
+    name = partition_name(month)
+    start, end = _bound(month), _bound(add_months(month, 1))
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [name])
+        if cursor.fetchone()[0] is not None:
+            return False
+
+        cursor.execute(f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        cursor.execute(
+            f"WITH moved AS (DELETE FROM {default_partition_name()} "
+            "WHERE created_at >= %s AND created_at < %s RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved",
+            [start, end]
+        )
+        moved = cursor.rowcount
+        cursor.execute(
+            f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)",
+            [start, end]
+        )
+
+    logger.info(f"Created partition {name}, moved {moved} rows from the default partition")
+    return True
+
+
+def ensure_partitions(months_ahead=partition_months_ahead):
+    """
+    Create partitions from the current month up to months_ahead months ahead.
+    Return names of created partitions, nothing if the table isn't partitioned.
+    """
+    if not is_partitioned():
+        return []
+
+    current = month_start(timezone.localdate())
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if create_partition(month):
+            created.append(partition_name(month))
+    return created
+
+
+def _unfinished_count(table):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT count(*) FROM {table} WHERE status <> %s",
+            [ProcessingStatus.COMPLETED]
+        )
+        return cursor.fetchone()[0]
+
+
+def _copy_to_archive(cursor, source, where='', params=()):
+    columns = ', '.join(ARCHIVE_FIELDS)
+    cursor.execute(
+        f"INSERT INTO {ActivityArchive._meta.db_table} ({columns}) "
+        f"SELECT {columns} FROM {source} {where} "
+        "ON CONFLICT (id) DO NOTHING",
+        list(params)
+    )
+    return cursor.rowcount
+
+
+def _invalidate_archived_month(month, chunk_size=archive_chunk_size):
+    # Keyset chunks of the archived ids, only one chunk is held at a time
+    start, end = (datetime(day.year, day.month, 1, tzinfo=dt_timezone.utc) for day in (month, add_months(month, 1)))
+    last_id = 0
+    while True:
+        ids = list(
+            ActivityArchive.objects
+            .filter(created_at__gte=start, created_at__lt=end, id__gt=last_id)
+            .order_by('id')
+            .values_list('id', flat=True)
+            [:chunk_size]
+        )
+        if not ids:
+            return
+        invalidate_status_payloads(ids)
+        last_id = ids[-1]
+
+
+def archive_partition(name, force=False):
+    """
+    Copy one monthly partition into the archive table, then detach and drop it.
+    Partitions with unfinished activities are skipped unless force.
+    Return number of rows archived, None if skipped.
+    """
+    if not force and _unfinished_count(name):
+        logger.warning(f"Partition {name} has unfinished activities, skipped")
+        return None
+
+    table = Activity._meta.db_table
+    month = partition_month(name)
+    with transaction.atomic(), connection.cursor() as cursor:
+        archived = _copy_to_archive(cursor, name)
+        cursor.execute(f"ALTER TABLE {table} DETACH PARTITION {name}")
+        cursor.execute(f"DROP TABLE {name}")
+        # DROP sends no post_delete, cached statuses of the rows would be served for days
+        transaction.on_commit(lambda: _invalidate_archived_month(month))
+
+    logger.info(f"Archived {archived} rows of partition {name}")
+    return archived
+
+
+def archive_rows_before(cutoff, force=False, chunk_size=archive_chunk_size):
+    """
+    Move activities created before cutoff into the archive in id chunks,
+    for tables that aren't partitioned. Return number of rows archived.
+    """
+    activities = Activity.objects.filter(created_at__lt=cutoff)
+    if not force:
+        activities = activities.filter(status=ProcessingStatus.COMPLETED)
+
+    table = Activity._meta.db_table
+    archived = 0
+    while True:
+        ids = list(activities.order_by('id').values_list('id', flat=True)[:chunk_size])
+        if not ids:
+            return archived
+
+        placeholders = ', '.join(['%s'] * len(ids))
+        with transaction.atomic(), connection.cursor() as cursor:
+            _copy_to_archive(cursor, table, f"WHERE id IN ({placeholders})", ids)
+            Activity.objects.filter(id__in=ids).delete()
+        archived += len(ids)
+        logger.info(f"Archived {archived} activities so far")
+
+
+def archive_before(cutoff_month, force=False):
+    """
+    Archive activities created before the first day of cutoff_month.
+    Whole partitions on a partitioned table, row chunks otherwise.
+    Return {partition name or 'rows': archived count or None if skipped}.
+    """
+    cutoff_month = month_start(cutoff_month)
+    if not is_partitioned():
+        cutoff = timezone.make_aware(datetime(cutoff_month.year, cutoff_month.month, 1))
+        return {'rows': archive_rows_before(cutoff, force=force)}
+
+    results = {}
+    for month, name in list_partitions():
+        if month < cutoff_month:
+            results[name] = archive_partition(name, force=force)
+    return results
@@ -0,0 +1,204 @@
+import asyncio
+import logging
+import signal
+
+import redis
+import redis.asyncio as aioredis
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.utils import timezone
+
+from .claims import claim_activities
+from .dispatch import dispatch_in_batches
+from .enums import ProcessingLane, ProcessingStatus
+from .lanes import async_lane_queue
+from .monitoring import increment_counter, increment_counters, observe_stages, stage_timer
+
+from realtime_config.realtime_config import get_config, with_config_snapshot
+
+
+logger = logging.getLogger(__name__)
+
+# Ids pushed to the asyncio queue per command
+push_chunk_size = 1000
+# BLPOP timeout, also how often the worker checks for shutdown and limit changes, s
+pop_timeout_s = 1
+
+
+class ProcessingBackend:
+    """
+    Where activities are sent to be processed.
+    Dispatchers (outbox relay, requeue task) only call dispatch().
+    """
+    name = None
+
+    def dispatch(self, activity_ids, lane=ProcessingLane.INTERACTIVE):
+        """
+        Queue activities for processing in lane, return backend specific handles.
+        """
+        raise NotImplementedError
+
+
+class CeleryBackend(ProcessingBackend):
+    """
+    process_activities_batch tasks on the queue of the lane, one prefork slot per batch.
+    """
+    name = 'celery'
+
+    def dispatch(self, activity_ids, lane=ProcessingLane.INTERACTIVE):
+        return dispatch_in_batches(activity_ids, lane=lane)
+
+
+class AsyncioBackend(ProcessingBackend):
+    """
+    Redis list per lane drained by AsyncActivityWorker, thousands of activities in flight per process.
+    """
+    name = 'asyncio'
+
+    def __init__(self):
+        self.redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+    def dispatch(self, activity_ids, lane=ProcessingLane.INTERACTIVE):
+        activity_ids = list(activity_ids)
+        if not activity_ids:
+            return []
+
+        queue_name = async_lane_queue(lane)
+        pipe = self.redis_client.pipeline(transaction=False)
+        for start in range(0, len(activity_ids), push_chunk_size):
+            pipe.rpush(queue_name, *activity_ids[start:start + push_chunk_size])
+        pipe.execute()
+        logger.info("Queued %d activities to '%s'", len(activity_ids), queue_name)
+        return activity_ids
+
+
+BACKENDS = {backend.name: backend for backend in (CeleryBackend, AsyncioBackend)}
+_backends = {}
+
+
+def get_backend(name=None):
+    """
+    Backend instance by name, ACTIVITY_PROCESSING_BACKEND setting by default.
+    """
+    name = name or getattr(settings, 'ACTIVITY_PROCESSING_BACKEND', CeleryBackend.name)
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown processing backend: {name}. Valid: {', '.join(BACKENDS)}")
+    if name not in _backends:
+        _backends[name] = BACKENDS[name]()
+    return _backends[name]
+
+
+class AsyncActivityWorker:
+    """
+    Processes activities from the asyncio backend lane queues as coroutines.
+    Lanes are taken in the given order, a lane is served only while the ones before it are empty.
+    Waits don't hold a process, the number in flight is limited by
+    ASYNC_WORKER_MAX_IN_FLIGHT realtime config, re-read before taking each activity.
+
+    Ids are removed from the queue when taken, activities of a killed worker stay PROCESSING
+    until they are stale (stale_processing_s), then requeue_pending_activities queues them again.
+    """
+
+    def __init__(self, lanes=None):
+        self.queue_names = [async_lane_queue(lane) for lane in (lanes or ProcessingLane.values)]
+        self._in_flight = set()
+        self._stopping = False
+
+    def stop(self):
+        logger.info("Stopping async worker, %d activities in flight", len(self._in_flight))
+        self._stopping = True
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(signum, self.stop)
+
+        retry_interval = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+        client = aioredis.Redis.from_url(settings.CELERY_BROKER_URL)
+        logger.info("Async worker consuming %s", ', '.join(self.queue_names))
+
+        try:
+            while not self._stopping:
+                # Backpressure: take nothing new while at the limit
+                max_in_flight = max(1, int(get_config('ASYNC_WORKER_MAX_IN_FLIGHT', 1000)))
+                if len(self._in_flight) >= max_in_flight:
+                    await asyncio.wait(self._in_flight, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+
+                try:
+                    item = await client.blpop(self.queue_names, timeout=pop_timeout_s)
+                except redis.exceptions.RedisError as e:
+                    logger.warning("Async worker queue error: %s. Retrying in %s seconds...",
+                                   e, retry_interval)
+                    await asyncio.sleep(retry_interval)
+                    continue
+                if item is None:
+                    continue
+
+                task = asyncio.create_task(self.process(int(item[1])))
+                self._in_flight.add(task)
+                task.add_done_callback(self._in_flight.discard)
+
+            if self._in_flight:
+                await asyncio.gather(*self._in_flight, return_exceptions=True)
+        finally:
+            await client.aclose()
+
+    @with_config_snapshot
+    async def process(self, activity_id):
+        """
+        Same steps as process_activity, with non-blocking waits.
+        Failed activities are retried by requeue_pending_activities.
+        """
+        delay_time = float(get_config('TASK_PROCESSING_DELAY_S', 5.0))
+
+        task_started_at = timezone.now()
+        # Stage durations for latency histograms
+        stages = {}
+
+        # Claim loads the activity and marks it PROCESSING in one transaction
+        with stage_timer(stages, 'db_load'):
+            claimed, missing_ids = await sync_to_async(claim_activities)([activity_id])
+        if missing_ids:
+            logger.error("Activity %s not found", activity_id)
+            return False
+        if not claimed:
+            logger.info("Activity %s is claimed by another worker, skipped", activity_id)
+            return False
+
+        activity = claimed[0]
+        increment_counter('tasks_started')
+        stages['queue_wait'] = (task_started_at - activity.created_at).total_seconds()
+
+        try:
+            with stage_timer(stages, 'compute'):
+                # Delay happens here, without blocking other activities
+                await asyncio.sleep(delay_time)
+                calories = activity.calculate_calories()
+            if calories is None:
+                raise ValueError("Failed to calculate calories")
+
+            with stage_timer(stages, 'status_write'):
+                await activity.aupdate_status(ProcessingStatus.COMPLETED, calories=calories)
+            stages['processing_time'] = activity.processing_time
+
+            increment_counters({
+                'tasks_completed': 1,
+                'total_calories': float(calories),
+            })
+            observe_stages(activity.activity_type, stages)
+            return True
+
+        except Exception as exc:
+            logger.exception("Error processing activity %s: %s", activity_id, exc)
+            increment_counter('tasks_failed')
+            try:
+                await activity.aupdate_status(
+                    ProcessingStatus.FAILED,
+                    error_msg=f"Processing error: {str(exc)}"
+                )
+            except Exception as update_exc:
+                logger.exception(
+                    "Failed to update failed activity %s status: %s", activity_id, update_exc
+                )
+            return False
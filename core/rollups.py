@@ -0,0 +1,159 @@
+import logging
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import DatabaseError, connection, transaction
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .enums import ProcessingStatus
+from .models import Activity, ActivityArchive, ActivityRollup
+from .signals import activity_status_changed
+
+
+logger = logging.getLogger(__name__)
+
+# Rows read per query by backfill_rollups
+backfill_chunk_size = 10000
+
+
+def period_starts(created_at):
+    """
+    Return {period: first day} of periods an activity created at created_at falls into.
+    """
+    day = timezone.localdate(created_at)
+    return {
+        ActivityRollup.PERIOD_DAY: day,
+        ActivityRollup.PERIOD_WEEK: day - timedelta(days=day.weekday()),
+    }
+
+
+def add_to_totals(totals, created_at, activity_type, duration_minutes, calories):
+    """
+    Add one completed activity to {(period, start, type): [count, minutes, calories]}.
+    """
+    for period, start in period_starts(created_at).items():
+        total = totals[(period, start, activity_type)]
+        total[0] += 1
+        total[1] += duration_minutes
+        total[2] += Decimal(str(calories or 0))
+
+
+def new_totals():
+    return defaultdict(lambda: [0, 0, Decimal('0')])
+
+
+def apply_rollup_increments(totals):
+    """
+    Add totals to rollup rows with one INSERT ... ON CONFLICT DO UPDATE.
+    Rows are upserted in key order, so concurrent increments lock them in the same order
+    and wait for each other instead of deadlocking.
+    """
+    if not totals:
+        return
+
+    table = ActivityRollup._meta.db_table
+    placeholders = ', '.join(['(%s, %s, %s, %s, %s, %s)'] * len(totals))
+    params = []
+    for (period, start, activity_type), (count, minutes, calories) in sorted(totals.items()):
+        params.extend([period, start, activity_type, count, minutes, calories])
+
+    # Same syntax on Postgres and SQLite
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {table} "
+            "(period, period_start, activity_type, activity_count, duration_minutes, calories_burned) "
+            f"VALUES {placeholders} "
+            "ON CONFLICT (period, period_start, activity_type) DO UPDATE SET "
+            f"activity_count = {table}.activity_count + EXCLUDED.activity_count, "
+            f"duration_minutes = {table}.duration_minutes + EXCLUDED.duration_minutes, "
+            f"calories_burned = {table}.calories_burned + EXCLUDED.calories_burned",
+            params
+        )
+
+
+def apply_committed_increments(totals):
+    """
+    Apply increments of a committed status change. Never raises:
+    the status is already saved, a failed increment is left for backfill_rollups.
+    """
+    try:
+        apply_rollup_increments(totals)
+    except DatabaseError as e:
+        logger.warning("Failed to apply %d rollup increments, backfill_rollups repairs them: %s",
+                       len(totals), e)
+
+
+@receiver(activity_status_changed, dispatch_uid='increment_activity_rollups')
+def status_changed_handler(sender, activities, previous_statuses=None, **kwargs):
+    """
+    Count activities that just completed, once the transaction that completed them commits:
+    hot rollup rows (today, this week) are never locked while a status write is open,
+    and rollup contention can't fail processing.
+    Completed activities changed later (recompute_calories) need backfill_rollups.
+    """
+    if previous_statuses is None:
+        return
+
+    totals = new_totals()
+    for activity, previous_status in zip(activities, previous_statuses):
+        if activity.status == ProcessingStatus.COMPLETED and previous_status != ProcessingStatus.COMPLETED:
+            add_to_totals(totals, activity.created_at, activity.activity_type,
+                          activity.duration_minutes, activity.calories_burned)
+    if totals:
+        transaction.on_commit(lambda: apply_committed_increments(totals))
+
+
+def completed_row_chunks(model, chunk_size=backfill_chunk_size):
+    """
+    Yield lists of (id, created_at, activity_type, duration_minutes, calories_burned)
+    of completed rows of model (Activity or ActivityArchive), keyset chunks by id.
+    """
+    last_id = 0
+    while True:
+        rows = list(
+            model.objects
+            .filter(status=ProcessingStatus.COMPLETED, id__gt=last_id)
+            .order_by('id')
+            .values_list('id', 'created_at', 'activity_type', 'duration_minutes', 'calories_burned')
+            [:chunk_size]
+        )
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        yield rows
+
+
+def rebuild_rollups(chunk_size=backfill_chunk_size, progress=None):
+    """
+    Recalculate all rollups from completed activities, archived ones included.
+    Reads activities in keyset chunks, only the totals are kept in memory,
+    then replaces the rollup rows in one transaction.
+    Activities completing or archived meanwhile are counted in the replaced rows only if read,
+    run it when processing is quiet. Return number of rollup rows written.
+    """
+    totals = new_totals()
+    read_count = 0
+
+    for model in (ActivityArchive, Activity):
+        for rows in completed_row_chunks(model, chunk_size):
+            read_count += len(rows)
+            for _, created_at, activity_type, duration_minutes, calories in rows:
+                add_to_totals(totals, created_at, activity_type, duration_minutes, calories)
+            if progress:
+                progress(read_count, rows[-1][0])
+
+    rollups = [
+        ActivityRollup(
+            period=period, period_start=start, activity_type=activity_type,
+            activity_count=count, duration_minutes=minutes, calories_burned=calories
+        )
+        for (period, start, activity_type), (count, minutes, calories) in totals.items()
+    ]
+    with transaction.atomic():
+        ActivityRollup.objects.all().delete()
+        ActivityRollup.objects.bulk_create(rollups, batch_size=1000)
+
+    logger.info(f"Rebuilt {len(rollups)} rollup rows from {read_count} completed activities")
+    return len(rollups)
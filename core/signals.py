@@ -0,0 +1,7 @@
+from django.dispatch import Signal
+
+
+# Sent after activities change processing status and are saved.
+# Arguments: activities - list of Activity instances with their new state,
+#            previous_statuses - list of their statuses before the change, same order
+activity_status_changed = Signal()
@@ -0,0 +1,128 @@
+import hashlib
+import json
+import logging
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from .enums import ProcessingStatus
+from .models import Activity
+from .signals import activity_status_changed
+
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+# Cached payloads of finished activities live this long, s...
+terminal_cache_ttl_s = 7 * 24 * 3600
+# ... the rest are rewritten on every transition anyway
+active_cache_ttl_s = 3600
+
+TERMINAL_STATUSES = (ProcessingStatus.COMPLETED,)
+
+
+def _cache_key(activity_id):
+    return f"activity_status:{activity_id}"
+
+
+def _ttl(payload):
+    return terminal_cache_ttl_s if payload['status'] in TERMINAL_STATUSES else active_cache_ttl_s
+
+
+def cache_status_payloads(payloads, only_missing=False):
+    """
+    Write status payloads with one pipeline. Never raises.
+    only_missing writes with SET NX: payloads read from the database may already be stale,
+    they must not overwrite the write-through of a transition committed after the read.
+    """
+    if not payloads:
+        return
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for payload in payloads:
+            pipe.set(_cache_key(payload['id']), json.dumps(payload), ex=_ttl(payload), nx=only_missing)
+        pipe.execute()
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Failed to cache {len(payloads)} status payloads: {e}")
+
+
+def invalidate_status_payloads(activity_ids):
+    """
+    Drop cached payloads, next read loads them from the database. Never raises.
+    """
+    if not activity_ids:
+        return
+    try:
+        redis_client.delete(*[_cache_key(activity_id) for activity_id in activity_ids])
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Failed to invalidate {len(activity_ids)} status payloads: {e}")
+
+
+def get_status_payloads(activity_ids):
+    """
+    Return {id: status payload} of existing activities with one MGET.
+    Only cache misses are read from the database, and are cached for the next poll
+    unless a transition was cached meanwhile.
+    """
+    activity_ids = list(dict.fromkeys(activity_ids))
+    if not activity_ids:
+        return {}
+
+    payloads = {}
+    try:
+        values = redis_client.mget([_cache_key(activity_id) for activity_id in activity_ids])
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Failed to read cached status payloads: {e}")
+        values = [None] * len(activity_ids)
+
+    for activity_id, value in zip(activity_ids, values):
+        if value is not None:
+            payloads[activity_id] = json.loads(value)
+
+    missing_ids = [activity_id for activity_id in activity_ids if activity_id not in payloads]
+    if missing_ids:
+        loaded = [activity.status_payload() for activity in Activity.objects.filter(pk__in=missing_ids)]
+        cache_status_payloads(loaded, only_missing=True)
+        payloads.update((payload['id'], payload) for payload in loaded)
+
+    return payloads
+
+
+def get_status_payload(activity_id):
+    """
+    Cached status payload of one activity, None if it doesn't exist.
+    """
+    return get_status_payloads([activity_id]).get(activity_id)
+
+
+def payloads_etag(payloads):
+    """
+    Strong ETag of payloads, changes with any id or updated_at.
+    """
+    versions = ','.join(f"{payload['id']}:{payload['updated_at']}" for payload in
+                        sorted(payloads, key=lambda payload: payload['id']))
+    return f'"{hashlib.sha1(versions.encode()).hexdigest()}"'
+
+
+def is_terminal(payloads):
+    return bool(payloads) and all(payload['status'] in TERMINAL_STATUSES for payload in payloads)
+
+
+@receiver(activity_status_changed, dispatch_uid='cache_activity_status_payloads')
+def status_changed_handler(sender, activities, **kwargs):
+    """
+    Write-through of new status once the transaction that made it commits,
+    overwrites whatever a cache miss filled in.
+    """
+    payloads = [activity.status_payload() for activity in activities]
+    transaction.on_commit(lambda: cache_status_payloads(payloads))
+
+
+@receiver(post_delete, sender=Activity, dispatch_uid='invalidate_activity_status_payload')
+def activity_deleted_handler(sender, instance, **kwargs):
+    activity_id = instance.id
+    transaction.on_commit(lambda: invalidate_status_payloads([activity_id]))
@@ -0,0 +1,115 @@
+import logging
+from collections import Counter
+
+import redis
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .enums import ProcessingStatus
+from .models import Activity
+from .signals import activity_status_changed
+
+
+logger = logging.getLogger(__name__)
+
+redis_client = redis.Redis.from_url(settings.CELERY_BROKER_URL)
+
+# Redis hash {status: number of activities}, adjusted on every transition
+# and rebuilt from the database by reconcile_status_counts
+STATUS_COUNTS_KEY = 'activity_status_counts'
+
+
+def adjust_status_counts(deltas):
+    """
+    Apply {status: delta} once the current transaction commits.
+    Never raises, drift is fixed by the next reconciliation.
+    """
+    deltas = {status: delta for status, delta in deltas.items() if status and delta}
+    if not deltas:
+        return
+
+    def apply():
+        try:
+            pipe = redis_client.pipeline(transaction=True)
+            for status, delta in deltas.items():
+                pipe.hincrby(STATUS_COUNTS_KEY, status, delta)
+            pipe.execute()
+        except redis.exceptions.RedisError as e:
+            logger.warning(f"Failed to adjust status counts {deltas}: {e}")
+
+    transaction.on_commit(apply)
+
+
+def count_statuses_in_db():
+    """
+    Exact {status: count} with one GROUP BY query.
+    """
+    counts = {status: 0 for status in ProcessingStatus.values}
+    for row in Activity.objects.order_by().values('status').annotate(total=Count('id')):
+        counts[row['status']] = row['total']
+    return counts
+
+
+def reconcile_status_counts():
+    """
+    Overwrite the counts with an exact database count.
+    Transitions committed while the count runs can be off by their delta until the next run.
+    Return the counts written.
+    """
+    counts = count_statuses_in_db()
+    redis_client.hset(STATUS_COUNTS_KEY, mapping=counts)
+    return counts
+
+
+def get_status_counts():
+    """
+    Return {status: count} with one HGETALL.
+    Counted in the database if Redis has no counts yet or is unavailable.
+    """
+    try:
+        data = redis_client.hgetall(STATUS_COUNTS_KEY)
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Failed to read status counts, counting in database: {e}")
+        return count_statuses_in_db()
+
+    if not data:
+        try:
+            return reconcile_status_counts()
+        except redis.exceptions.RedisError:
+            return count_statuses_in_db()
+
+    counts = {status: 0 for status in ProcessingStatus.values}
+    for status, value in data.items():
+        # Drift can briefly go below zero
+        counts[status.decode()] = max(0, int(value))
+    return counts
+
+
+def get_status_count(status):
+    return get_status_counts().get(status, 0)
+
+
+@receiver(activity_status_changed, dispatch_uid='adjust_status_counts_on_transition')
+def status_changed_handler(sender, activities, previous_statuses=None, **kwargs):
+    if previous_statuses is None:
+        return
+    deltas = Counter()
+    for activity, previous_status in zip(activities, previous_statuses):
+        if previous_status != activity.status:
+            deltas[previous_status] -= 1
+            deltas[activity.status] += 1
+    adjust_status_counts(deltas)
+
+
+@receiver(post_save, sender=Activity, dispatch_uid='adjust_status_counts_on_create')
+def activity_created_handler(sender, instance, created, **kwargs):
+    if created:
+        adjust_status_counts({instance.status: 1})
+
+
+@receiver(post_delete, sender=Activity, dispatch_uid='adjust_status_counts_on_delete')
+def activity_deleted_handler(sender, instance, **kwargs):
+    adjust_status_counts({instance.status: -1})
@@ -1,13 +1,25 @@
 import logging
+import math
 import time
 from celery import shared_task
+from django.db import transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce, Concat
 from django.utils import timezone
 from .models import Activity
-from .enums import ProcessingStatus
+from .enums import ProcessingLane, ProcessingStatus
+from .calories import calculate_calories_bulk
+from .claims import claim_activities, fail_claimed_activities, stale_processing_s
+from .pipeline import get_backend
+from .signals import activity_status_changed
+from . import partitions, status_counts
 
-from .monitoring import increment_counter, increment_counter_by
+from .monitoring import (
+    increment_counter, increment_counter_by, increment_counters,
+    observe_stages, stage_timer, BATCH_LABEL
+)
 
-from realtime_config.realtime_config import get_config
+from realtime_config.realtime_config import get_config, with_config_snapshot
 
 
 logger = logging.getLogger(__name__)
@@ -17,6 +29,8 @@ delay_time = 5
 max_retries_ = 3
 # Time before retrying on error
 retry_time = 30
+# Activities selected, updated and dispatched at once by requeue_pending_activities
+requeue_chunk_size = 1000
 
 
 @shared_task(
@@ -25,62 +39,69 @@ retry_time = 30
     default_retry_delay=retry_time,
     ignore_result=True
 )
+@with_config_snapshot
 def process_activity(self, activity_id):
     """
     Calculate calories burned and update status.
     ! Delay to simulate processing.
     Retry if fails.
+    Queued only after the activity is committed (outbox relay), a missing row was deleted.
+    A duplicate of a dispatch exits as soon as it finds the activity claimed by another task.
     """
     # realtime config
     delay_time = float(get_config('TASK_PROCESSING_DELAY_S', 5.0))
-    
-    increment_counter('tasks_started')
 
     # Start timing for performance monitoring
     start_time = time.time()
+    task_started_at = timezone.now()
+    # Stage durations for latency histograms
+    stages = {}
 
-    try:
-        activity = Activity.objects.get(id=activity_id)
-    # Will not retry the task if activity doesn't exist
-    except Activity.DoesNotExist:
-        logger.error(f"Activity {activity_id} not found")
-        
-        retry_delay = retry_time * (2 ** self.request.retries)
-        raise self.retry(countdown=retry_delay, exc=Exception(f"Activity {activity_id} not yet in database"))
+    # Claim loads the activity and marks it PROCESSING in one transaction
+    with stage_timer(stages, 'db_load'):
+        claimed, missing_ids = claim_activities([activity_id], task_id=self.request.id)
+    if missing_ids:
+        logger.error("Activity %s not found", activity_id)
+        return False
+    if not claimed:
+        logger.info("Activity %s is claimed by another task, skipped", activity_id)
+        return False
+
+    activity = claimed[0]
+    increment_counter('tasks_started')
+    stages['queue_wait'] = (task_started_at - activity.created_at).total_seconds()
+    # Lazy %-formatting: skipped records cost no formatting
+    logger.info("Starting processing activity %s, processing for %ss", activity_id, delay_time)
 
-    activity.update_status(ProcessingStatus.PROCESSING)
-    logger.info(f"Starting processing activity {activity_id}")
-    
     try:
-        activity.celery_task_id = self.request.id
-        activity.save(update_fields=['celery_task_id'])
-        
-        # Delay happens here ! ! !
-        logger.info(f"Got the activity {activity_id}, processing for {delay_time}s")
-        time.sleep(delay_time)
-        
-        calories = activity.calculate_calories()
+        with stage_timer(stages, 'compute'):
+            # Delay happens here ! ! !
+            time.sleep(delay_time)
+
+            calories = activity.calculate_calories()
         if calories is None:
             raise ValueError("Failed to calculate calories")
         
-        activity.update_status(ProcessingStatus.COMPLETED, calories=calories)
+        with stage_timer(stages, 'status_write'):
+            activity.update_status(ProcessingStatus.COMPLETED, calories=calories)
+        stages['processing_time'] = activity.processing_time
 
         duration = time.time() - start_time
         logger.info(
-            f"Successfully processed activity {activity_id}: burned {calories} calories"
-            f" - in {duration:.2f}s"
+            "Successfully processed activity %s: burned %s calories - in %.2fs",
+            activity_id, calories, duration
         )
 
         increment_counter('tasks_completed')
-        calories_int = int(float(calories))
-        increment_counter_by('total_calories', calories_int)
+        increment_counter_by('total_calories', float(calories))
+        observe_stages(activity.activity_type, stages)
 
         return True
     
     except Exception as exc:
         duration = time.time() - start_time
         logger.exception(
-            f"Error processing activity {activity_id} after {duration:.2f}s: {str(exc)}"
+            "Error processing activity %s after %.2fs: %s", activity_id, duration, exc
         )
 
         increment_counter('tasks_failed')
@@ -93,56 +114,253 @@ def process_activity(self, activity_id):
             )
         except Exception as update_exc:
             logger.exception(
-                f"Failed to update failed activity {activity_id} status: {str(update_exc)}"
+                "Failed to update failed activity %s status: %s", activity_id, update_exc
             )
         
         # Retry with respect to max_retries
         raise self.retry(exc=exc)
     
 
+@shared_task(
+    bind=True,
+    max_retries=max_retries_,
+    default_retry_delay=retry_time,
+    ignore_result=True
+)
+@with_config_snapshot
+def process_activities_batch(self, activity_ids):
+    """
+    Calculate calories burned for many activities in one task.
+    ! Delay to simulate processing, once per batch.
+    Claim with one locking query, save with one bulk_update, count with one pipeline.
+    Activities claimed by another task are skipped, a row that fails is marked FAILED
+    without failing the rest of the batch.
+    If saving the batch fails, its activities are marked FAILED and the task is retried.
+    """
+    # realtime config
+    delay_time = float(get_config('TASK_PROCESSING_DELAY_S', 5.0))
+
+    start_time = time.time()
+    task_started_at = timezone.now()
+    # Stage durations of the whole batch for latency histograms
+    stages = {}
+
+    # Claim loads the activities and marks them PROCESSING in one transaction
+    with stage_timer(stages, 'db_load'):
+        activities, missing_ids = claim_activities(activity_ids, task_id=self.request.id)
+
+    # Batches are queued after commit, missing rows were deleted
+    if missing_ids:
+        logger.warning("Activities %s not found, skipped", sorted(missing_ids))
+
+    if not activities:
+        return 0
+
+    logger.info("Starting processing batch of %d activities, processing for %ss",
+                len(activities), delay_time)
+
+    with stage_timer(stages, 'compute'):
+        # Delay happens here ! ! !
+        time.sleep(delay_time)
+
+        # MET values resolved once for the whole batch, NaN for rows that can't be calculated
+        batch_calories = calculate_calories_bulk(
+            [activity.activity_type for activity in activities],
+            [activity.duration_minutes for activity in activities],
+            [activity.weight_kg for activity in activities],
+        ).tolist()
+
+    processed_at = timezone.now()
+    completed_count = 0
+    failed_count = 0
+    calories_total = 0.0
+
+    for activity, calories in zip(activities, batch_calories):
+        activity.processed_at = processed_at
+        # bulk_update doesn't apply auto_now
+        activity.updated_at = processed_at
+        if math.isnan(calories):
+            logger.error("Error processing activity %s in batch: Failed to calculate calories",
+                         activity.id)
+            activity.status = ProcessingStatus.FAILED
+            activity.calories_burned = None
+            activity.error_message = "Processing error: Failed to calculate calories"
+            failed_count += 1
+        else:
+            activity.status = ProcessingStatus.COMPLETED
+            activity.calories_burned = calories
+            activity.error_message = None
+            completed_count += 1
+            calories_total += calories
+
+    try:
+        with stage_timer(stages, 'status_write'), transaction.atomic():
+            Activity.objects.bulk_update(activities, [
+                'status', 'calories_burned', 'error_message',
+                'processed_at', 'updated_at'
+            ])
+            activity_status_changed.send(
+                sender=Activity, activities=activities,
+                previous_statuses=[ProcessingStatus.PROCESSING] * len(activities)
+            )
+    except Exception as exc:
+        logger.exception("Failed to save batch of %d activities: %s", len(activities), exc)
+        increment_counters({'tasks_started': len(activities), 'tasks_failed': len(activities)})
+
+        # Release the claims, otherwise the retry skips the rows until they turn stale
+        try:
+            fail_claimed_activities(activities, f"Processing error: {str(exc)}", task_id=self.request.id)
+        except Exception as update_exc:
+            logger.exception("Failed to mark batch of %d activities failed: %s", len(activities), update_exc)
+
+        # Retry with respect to max_retries
+        raise self.retry(exc=exc)
+
+    # Per activity stages by type, shared stages once per batch
+    for activity in activities:
+        activity_stages = {
+            'queue_wait': (task_started_at - activity.created_at).total_seconds()
+        }
+        if activity.status == ProcessingStatus.COMPLETED:
+            activity_stages['processing_time'] = activity.processing_time
+        observe_stages(activity.activity_type, activity_stages)
+    observe_stages(BATCH_LABEL, stages)
+
+    increment_counters({
+        'tasks_started': len(activities),
+        'tasks_completed': completed_count,
+        'tasks_failed': failed_count,
+        'total_calories': round(calories_total, 2),
+    })
+
+    duration = time.time() - start_time
+    logger.info(
+        "Processed batch of %d activities: %d completed, %d failed - in %.2fs",
+        len(activities), completed_count, failed_count, duration
+    )
+
+    return completed_count
+
+
+def _requeue_chunks(queryset, limit):
+    """
+    Yield activities of queryset in id order, chunks of up to requeue_chunk_size,
+    limit in total. Keyset pagination, one query per chunk.
+    """
+    last_id = 0
+    while limit > 0:
+        chunk = list(
+            queryset.filter(id__gt=last_id)
+            .order_by('id')
+            .only('id', 'status', 'calories_burned', 'processed_at', 'error_message', 'updated_at')
+            [:min(requeue_chunk_size, limit)]
+        )
+        if not chunk:
+            return
+        last_id = chunk[-1].id
+        limit -= len(chunk)
+        yield chunk
+
+
 @shared_task
-def requeue_pending_activities():    
-    cutoff = timezone.now() - timezone.timedelta(minutes=1)
+@with_config_snapshot
+def requeue_pending_activities():
+    """
+    Queue stuck PENDING and retry FAILED activities in batches on the retry lane,
+    so a large retry burst doesn't delay new activities.
+    PROCESSING activities abandoned by a killed worker (stale_processing_s) are queued with stuck ones.
+    At most REQUEUE_MAX_PER_RUN activities per run, the rest is picked up by the next one,
+    so a large backlog can't make a run outlive its schedule.
+    """
+    counts = status_counts.get_status_counts()
+    if not any(counts[status] for status in (
+        ProcessingStatus.PENDING, ProcessingStatus.FAILED, ProcessingStatus.PROCESSING
+    )):
+        return "Requeued 0 pending and 0 failed activities"
+
+    now = timezone.now()
+    cutoff = now - timezone.timedelta(minutes=1)
+    max_per_run = max(0, int(get_config('REQUEUE_MAX_PER_RUN', 10000)))
 
+    # Duplicates of activities still queued are skipped by claim_activities
     pending_activities = Activity.objects.filter(
-        status=ProcessingStatus.PENDING,
-        created_at__lte=cutoff
+        Q(status=ProcessingStatus.PENDING, created_at__lte=cutoff)
+        | Q(status=ProcessingStatus.PROCESSING, updated_at__lt=now - timezone.timedelta(seconds=stale_processing_s))
     )
 
     failed_activities = Activity.objects.filter(
         status=ProcessingStatus.FAILED,
     )
-    
-    pending_count = pending_activities.count()
-    failed_count = failed_activities.count()
-    
-    logger.info(f"Found {pending_count} activities stuck in PENDING status")
-    logger.info(f"Found {failed_count} FAILED activities to retry")
-    
-    for activity in pending_activities:
+
+    pending_count = 0
+    for chunk in _requeue_chunks(pending_activities, max_per_run):
+        activity_ids = [activity.id for activity in chunk]
         try:
-            result = process_activity.delay(activity.id)
-            activity.celery_task_id = result.id
-            activity.save(update_fields=['celery_task_id'])
-            logger.info(f"Requeued activity {activity.id} with task {result.id}")
-        
+            get_backend().dispatch(activity_ids, lane=ProcessingLane.RETRY)
+            pending_count += len(activity_ids)
         except Exception as e:
-            logger.error(f"Failed to requeue activity {activity.id}: {str(e)}")
+            logger.error("Failed to requeue %d activities %s..%s: %s",
+                         len(activity_ids), activity_ids[0], activity_ids[-1], e)
+            break
 
-    for activity in failed_activities:
+    failed_count = 0
+    for chunk in _requeue_chunks(failed_activities, max_per_run - pending_count):
+        activity_ids = [activity.id for activity in chunk]
+        now = timezone.now()
         try:
-            result = process_activity.delay(activity.id)
-            activity.status = ProcessingStatus.PENDING
-            activity.celery_task_id = result.id
-            activity.error_message = f"Retrying after {activity.error_message}"
-            activity.save(update_fields=['status', 'celery_task_id', 'error_message'])
-            
-            logger.info(f"Retrying FAILED activity {activity.id} with new task {result.id}")
+            with transaction.atomic():
+                # Rows changed since the select are left alone
+                Activity.objects.filter(id__in=activity_ids, status=ProcessingStatus.FAILED).update(
+                    status=ProcessingStatus.PENDING,
+                    error_message=Concat(
+                        Value('Retrying after '), Coalesce('error_message', Value(''))
+                    ),
+                    updated_at=now
+                )
+                for activity in chunk:
+                    activity.status = ProcessingStatus.PENDING
+                    activity.error_message = f"Retrying after {activity.error_message or ''}"
+                    activity.updated_at = now
+                activity_status_changed.send(
+                    sender=Activity, activities=chunk,
+                    previous_statuses=[ProcessingStatus.FAILED] * len(chunk)
+                )
+
+            get_backend().dispatch(activity_ids, lane=ProcessingLane.RETRY)
+            failed_count += len(activity_ids)
         except Exception as e:
-            logger.error(f"Failed to retry FAILED activity {activity.id}: {str(e)}")
+            logger.error("Failed to retry %d FAILED activities %s..%s: %s",
+                         len(activity_ids), activity_ids[0], activity_ids[-1], e)
+            break
+
+    logger.info("Requeued %d activities stuck in PENDING or PROCESSING status", pending_count)
+    logger.info("Retrying %d FAILED activities", failed_count)
+    if pending_count + failed_count >= max_per_run:
+        logger.warning("Requeue limit of %d activities reached, rest is left for the next run", max_per_run)
 
     total_requeued = pending_count + failed_count
     if total_requeued > 0:
         increment_counter('tasks_requeued', total_requeued)
-    
+
     return f"Requeued {pending_count} pending and {failed_count} failed activities"
+
+
+@shared_task
+def reconcile_status_counts():
+    """
+    Fix drift of the incrementally maintained status counts.
+    """
+    counts = status_counts.reconcile_status_counts()
+    logger.info("Reconciled status counts: %s", counts)
+    return counts
+
+
+@shared_task
+def ensure_activity_partitions():
+    """
+    Create monthly activity partitions ahead of time.
+    """
+    created = partitions.ensure_partitions()
+    if created:
+        logger.info("Created activity partitions: %s", ', '.join(created))
+    return created
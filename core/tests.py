@@ -1,3 +1,524 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import gzip
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import warnings
+from datetime import datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from prometheus_client.mmap_dict import MmapedDict, mmap_key
+from django.db import DatabaseError, connection, transaction
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import autoscale, claims, export, ingest, lanes, metrics, outbox, partitions, rollups, status_cache, tasks, views
+from .enums import ActivityType, ProcessingLane, ProcessingStatus
+from .events import broadcaster
+from .models import Activity, ActivityRollup, OutboxMessage
+from .pagination import decode_cursor, encode_cursor, paginate_by_cursor
+
+
+def create_activity(**fields):
+    fields = {'activity_type': ActivityType.RUN, 'duration_minutes': 30, 'weight_kg': '70.00', **fields}
+    activity = Activity.objects.create(**fields)
+    # Ids repeat between test runs, drop what an earlier run cached
+    status_cache.invalidate_status_payloads([activity.id])
+    return activity
+
+
+class ActivityStatusStreamTests(SimpleTestCase):
+
+    def read_stream(self):
+        request = RequestFactory().get('/api/activities/status/stream/')
+
+        async def read():
+            response = await views.activity_status_stream(request)
+            chunks = []
+            async for chunk in response.streaming_content:
+                chunks.append(chunk)
+                # Subscribed while the stream is open
+                self.assertEqual(len(broadcaster._subscribers), 1)
+            return chunks
+
+        return asyncio.run(read())
+
+    def test_stream_ends_after_lifetime_and_unsubscribes(self):
+        with mock.patch.object(views, 'stream_max_lifetime_s', 0.3), \
+                mock.patch.object(views, 'stream_heartbeat_s', 0.1):
+            chunks = self.read_stream()
+
+        self.assertTrue(chunks[0].startswith(b'retry: '))
+        self.assertIn(b': keep-alive\n\n', chunks)
+        self.assertEqual(len(broadcaster._subscribers), 0)
+
+
+class StatusCacheTests(TestCase):
+
+    def cached_status(self, activity_id):
+        value = status_cache.redis_client.get(status_cache._cache_key(activity_id))
+        return json.loads(value)['status'] if value else None
+
+    def test_miss_fill_does_not_overwrite_later_transition(self):
+        activity = create_activity()
+        status_payload = Activity.status_payload
+        completed = []
+
+        def load_then_complete(instance):
+            # A worker commits COMPLETED between the reader's query and its cache fill
+            payload = status_payload(instance)
+            if not completed:
+                completed.append(instance.id)
+                worker_copy = Activity.objects.get(pk=instance.id)
+                with self.captureOnCommitCallbacks(execute=True):
+                    worker_copy.update_status(ProcessingStatus.COMPLETED, calories=100)
+            return payload
+
+        with mock.patch.object(Activity, 'status_payload', autospec=True, side_effect=load_then_complete):
+            payloads = status_cache.get_status_payloads([activity.id])
+
+        self.assertEqual(payloads[activity.id]['status'], ProcessingStatus.PENDING)
+        self.assertEqual(self.cached_status(activity.id), ProcessingStatus.COMPLETED)
+
+    def test_miss_fills_cache(self):
+        activity = create_activity()
+
+        self.assertEqual(status_cache.get_status_payload(activity.id)['status'], ProcessingStatus.PENDING)
+        self.assertEqual(self.cached_status(activity.id), ProcessingStatus.PENDING)
+
+
+class ActivityBulkApiTests(TestCase):
+
+    def post_rows(self, rows):
+        body = '\n'.join(json.dumps(row) for row in rows)
+        return self.client.post(reverse('activity-bulk-api'), body, content_type='application/x-ndjson')
+
+    @override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=1024)
+    def test_body_over_upload_memory_size_is_ingested(self):
+        rows = [{'activity_type': ActivityType.WALK, 'duration_minutes': 20, 'weight_kg': '60.00'}] * 50
+
+        response = self.post_rows(rows)
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['created'], 50)
+
+    def test_body_over_limit_gets_json_413(self):
+        rows = [{'activity_type': ActivityType.WALK, 'duration_minutes': 20, 'weight_kg': '60.00'}] * 50
+
+        with mock.patch.object(views, 'bulk_max_body_bytes', 1024):
+            response = self.post_rows(rows)
+
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('error', response.json())
+        self.assertFalse(Activity.objects.exists())
+
+    @skipUnless(connection.vendor == 'postgresql', "COPY needs Postgres")
+    def test_copy_insert_returns_ids_of_inserted_rows(self):
+        validator = ingest.RowValidator()
+        rows = [
+            validator.validate({'activity_type': ActivityType.RUN, 'duration_minutes': 30,
+                                'weight_kg': '70.50', 'notes': notes})[0]
+            for notes in ('Hill, "steep"\nsecond line', '')
+        ]
+
+        with transaction.atomic():
+            ids = ingest.insert_activities(rows, use_copy=True)
+
+        activities = list(Activity.objects.order_by('id'))
+        self.assertEqual(ids, [activity.id for activity in activities])
+        self.assertEqual([activity.notes for activity in activities], ['Hill, "steep"\nsecond line', ''])
+        self.assertEqual({activity.status for activity in activities}, {ProcessingStatus.PENDING})
+        self.assertEqual(activities[0].weight_kg, Decimal('70.50'))
+
+    @skipUnless(connection.vendor == 'postgresql', "COPY needs Postgres")
+    def test_copy_ingest_counts_statuses_and_writes_outbox(self):
+        rows = [{'activity_type': ActivityType.WALK, 'duration_minutes': 20, 'weight_kg': '60.00'}] * 3
+        rows.append({'activity_type': 'fly', 'duration_minutes': 20, 'weight_kg': '60.00'})
+
+        with mock.patch.object(ingest, 'adjust_status_counts') as adjust_status_counts:
+            result = ingest.ingest_activities(rows, chunk_size=2)
+
+        self.assertEqual((result['created'], result['invalid']), (3, 1))
+        self.assertEqual(adjust_status_counts.call_args_list, [
+            mock.call({ProcessingStatus.PENDING: 2}), mock.call({ProcessingStatus.PENDING: 1}),
+        ])
+        messages = OutboxMessage.objects.order_by('activity_id')
+        self.assertEqual([message.activity_id for message in messages],
+                         list(Activity.objects.order_by('id').values_list('id', flat=True)))
+        self.assertEqual({message.lane for message in messages}, {ProcessingLane.BULK})
+
+
+class RollupTests(TestCase):
+
+    def test_completed_activity_is_counted_after_commit(self):
+        activity = create_activity(duration_minutes=60)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            activity.update_status(ProcessingStatus.COMPLETED, calories=630)
+            self.assertFalse(ActivityRollup.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        day = ActivityRollup.objects.get(period=ActivityRollup.PERIOD_DAY)
+        self.assertEqual((day.activity_count, day.duration_minutes, day.calories_burned), (1, 60, 630))
+        self.assertTrue(ActivityRollup.objects.filter(period=ActivityRollup.PERIOD_WEEK).exists())
+
+    def test_failed_increment_does_not_fail_status_write(self):
+        activity = create_activity()
+
+        with mock.patch.object(rollups, 'apply_rollup_increments', side_effect=DatabaseError('deadlock detected')), \
+                self.captureOnCommitCallbacks(execute=True):
+            activity.update_status(ProcessingStatus.COMPLETED, calories=100)
+
+        activity.refresh_from_db()
+        self.assertEqual(activity.status, ProcessingStatus.COMPLETED)
+        self.assertFalse(ActivityRollup.objects.exists())
+
+
+class ProcessActivitiesBatchTests(TestCase):
+
+    def run_batch(self, activity_ids):
+        # No artificial processing delay
+        with mock.patch.object(tasks.time, 'sleep'), self.captureOnCommitCallbacks(execute=True):
+            return tasks.process_activities_batch.apply(args=(activity_ids,))
+
+    def test_failed_save_releases_claims_and_retries(self):
+        activities = [create_activity(), create_activity()]
+        bulk_update = Activity.objects.bulk_update
+        calls = []
+
+        def fail_once(*args, **kwargs):
+            calls.append(1)
+            if len(calls) == 1:
+                raise DatabaseError('deadlock detected')
+            return bulk_update(*args, **kwargs)
+
+        with mock.patch.object(Activity.objects, 'bulk_update', side_effect=fail_once):
+            result = self.run_batch([activity.id for activity in activities])
+
+        # Retried and claimed the rows again instead of skipping them as claimed
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(result.result, 2)
+        for activity in activities:
+            activity.refresh_from_db()
+            self.assertEqual(activity.status, ProcessingStatus.COMPLETED)
+
+    def test_row_that_fails_does_not_fail_batch(self):
+        good = create_activity()
+        # Zero minutes can't be calculated
+        bad = create_activity(duration_minutes=0)
+
+        result = self.run_batch([good.id, bad.id])
+
+        self.assertEqual(result.result, 1)
+        good.refresh_from_db()
+        bad.refresh_from_db()
+        self.assertEqual(good.status, ProcessingStatus.COMPLETED)
+        self.assertEqual(bad.status, ProcessingStatus.FAILED)
+        self.assertIn("Failed to calculate calories", bad.error_message)
+
+
+class ArchiveTests(TestCase):
+
+    def complete(self, activity):
+        with self.captureOnCommitCallbacks(execute=True):
+            activity.update_status(ProcessingStatus.COMPLETED, calories=100)
+
+    def test_rebuild_rollups_keeps_archived_activities(self):
+        old, recent = create_activity(), create_activity()
+        self.complete(old)
+        self.complete(recent)
+        old_created_at = timezone.now() - timedelta(days=400)
+        Activity.objects.filter(pk=old.pk).update(created_at=old_created_at)
+
+        self.assertEqual(partitions.archive_rows_before(timezone.now() - timedelta(days=30)), 1)
+        rollups.rebuild_rollups()
+
+        days = ActivityRollup.objects.filter(period=ActivityRollup.PERIOD_DAY)
+        self.assertEqual(sum(day.activity_count for day in days), 2)
+        self.assertEqual(days.get(period_start=timezone.localdate(old_created_at)).activity_count, 1)
+
+    def test_archived_month_is_invalidated_in_chunks(self):
+        month = partitions.add_months(partitions.month_start(timezone.localdate()), -13)
+        activities = [create_activity(), create_activity(), create_activity()]
+        for activity in activities:
+            self.complete(activity)
+        Activity.objects.filter(pk__in=[activities[0].pk, activities[1].pk]).update(
+            created_at=timezone.make_aware(datetime(month.year, month.month, 15))
+        )
+        partitions.archive_rows_before(timezone.now() - timedelta(days=30))
+
+        with mock.patch.object(partitions, 'invalidate_status_payloads') as invalidate:
+            partitions._invalidate_archived_month(month, chunk_size=1)
+
+        self.assertEqual(invalidate.call_args_list, [mock.call([activities[0].id]), mock.call([activities[1].id])])
+
+    @skipUnless(connection.vendor == 'postgresql', "Partitions need Postgres")
+    def test_archived_partition_statuses_are_not_served(self):
+        activity = create_activity()
+        self.complete(activity)
+        month = partitions.add_months(partitions.month_start(timezone.localdate()), -13)
+        Activity.objects.filter(pk=activity.pk).update(
+            created_at=timezone.make_aware(datetime(month.year, month.month, 15))
+        )
+        partitions.create_partition(month)
+        self.assertIsNotNone(status_cache.get_status_payload(activity.id))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            partitions.archive_partition(partitions.partition_name(month))
+
+        self.assertIsNone(status_cache.get_status_payload(activity.id))
+
+
+class PipelineBenchmarkTests(SimpleTestCase):
+
+    def test_local_run_smoke(self):
+        # Own process: --local swaps the database and Redis clients before Django starts
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'run.json')
+            subprocess.run(
+                [sys.executable, '-m', 'benchmarks.bench_pipeline', '--local', '--activities', '5',
+                 '--concurrency', '2', '-o', output],
+                cwd=settings.BASE_DIR, check=True, capture_output=True, timeout=300
+            )
+            with open(output) as f:
+                results = json.load(f)
+
+        self.assertEqual(results['database'], 'sqlite')
+        self.assertEqual(results['concurrency'], 1)
+        self.assertEqual(set(results['stages']), {'create', 'status', 'status_list', 'process'})
+        for stage, summary in results['stages'].items():
+            self.assertEqual(summary['errors'], 0, stage)
+        self.assertEqual(results['stages']['create']['requests'], 5)
+        self.assertEqual(results['stages']['process']['requests'], 5)
+
+
+class ClaimTests(TestCase):
+
+    def test_duplicate_claim_exits_early(self):
+        activity = create_activity()
+
+        claimed, missing_ids = claims.claim_activities([activity.id], task_id='first')
+        self.assertEqual([claimed_activity.id for claimed_activity in claimed], [activity.id])
+        self.assertEqual(missing_ids, [])
+
+        with mock.patch.object(claims, 'increment_counter') as increment_counter:
+            claimed, missing_ids = claims.claim_activities([activity.id], task_id='duplicate')
+
+        self.assertEqual((claimed, missing_ids), ([], []))
+        increment_counter.assert_called_once_with('duplicates_avoided', 1)
+        activity.refresh_from_db()
+        self.assertEqual(activity.status, ProcessingStatus.PROCESSING)
+        self.assertEqual(activity.celery_task_id, 'first')
+
+    def test_finished_and_missing_activities_are_not_claimed(self):
+        activity = create_activity()
+        activity.update_status(ProcessingStatus.COMPLETED, calories=100)
+
+        claimed, missing_ids = claims.claim_activities([activity.id, activity.id + 1000])
+
+        self.assertEqual(claimed, [])
+        self.assertEqual(missing_ids, [activity.id + 1000])
+
+    def test_stale_processing_activity_is_claimed_again(self):
+        activity = create_activity()
+        claims.claim_activities([activity.id], task_id='killed')
+        Activity.objects.filter(pk=activity.pk).update(
+            updated_at=timezone.now() - timedelta(seconds=claims.stale_processing_s + 1)
+        )
+
+        claimed, _ = claims.claim_activities([activity.id], task_id='requeued')
+
+        self.assertEqual(claimed[0].celery_task_id, 'requeued')
+
+
+class OutboxRelayTests(TestCase):
+
+    def test_relay_deletes_only_dispatched_messages(self):
+        activities = [create_activity() for _ in range(3)]
+        outbox.enqueue_for_processing([activity.id for activity in activities[:2]])
+        outbox.enqueue_for_processing([activities[2].id], lane=ProcessingLane.BULK)
+        late = create_activity()
+        backend = mock.Mock()
+
+        def dispatch(activity_ids, lane):
+            # Enqueued by another transaction while the relay publishes
+            if not OutboxMessage.objects.filter(activity_id=late.id).exists():
+                outbox.enqueue_for_processing([late.id])
+
+        backend.dispatch.side_effect = dispatch
+        with mock.patch.object(outbox, 'get_backend', return_value=backend):
+            relayed = outbox.relay_batch(limit=3)
+
+        self.assertEqual(relayed, 3)
+        dispatched = {
+            call.kwargs['lane']: list(call.args[0]) for call in backend.dispatch.call_args_list
+        }
+        self.assertEqual(dispatched, {
+            ProcessingLane.INTERACTIVE: [activities[0].id, activities[1].id],
+            ProcessingLane.BULK: [activities[2].id],
+        })
+        self.assertEqual(list(OutboxMessage.objects.values_list('activity_id', flat=True)), [late.id])
+
+    def test_failed_dispatch_keeps_messages(self):
+        activity = create_activity()
+        outbox.enqueue_for_processing([activity.id])
+        backend = mock.Mock()
+        backend.dispatch.side_effect = ConnectionError('broker down')
+
+        with mock.patch.object(outbox, 'get_backend', return_value=backend), self.assertRaises(ConnectionError):
+            outbox.relay_batch()
+
+        self.assertTrue(OutboxMessage.objects.filter(activity_id=activity.id).exists())
+
+
+class CursorPaginationTests(TestCase):
+
+    def test_cursor_round_trip(self):
+        activity = create_activity()
+
+        self.assertEqual(decode_cursor(encode_cursor(activity)), (activity.created_at, activity.id))
+
+    def test_invalid_or_naive_cursor_is_ignored(self):
+        for raw in (b'', b'no separator', b'not a date|1', b'2025-01-01T00:00:00+00:00|x', b'2025-01-01T00:00:00|1'):
+            cursor = base64.urlsafe_b64encode(raw).decode()
+            self.assertIsNone(decode_cursor(cursor))
+        for cursor in ('not base64!', None):
+            self.assertIsNone(decode_cursor(cursor))
+
+    def test_pages_forward_and_back(self):
+        created_at = timezone.now()
+        activities = [create_activity() for _ in range(5)]
+        # Same created_at, order falls back to id
+        Activity.objects.update(created_at=created_at)
+        newest_first = [activity.id for activity in reversed(activities)]
+
+        first = paginate_by_cursor(Activity.objects.all(), 2)
+        second = paginate_by_cursor(Activity.objects.all(), 2, after=first.next_cursor)
+        third = paginate_by_cursor(Activity.objects.all(), 2, after=second.next_cursor)
+        back = paginate_by_cursor(Activity.objects.all(), 2, before=second.previous_cursor)
+
+        self.assertEqual([activity.id for activity in first], newest_first[:2])
+        self.assertEqual([activity.id for activity in second], newest_first[2:4])
+        self.assertEqual([activity.id for activity in third], newest_first[4:])
+        self.assertFalse(third.has_next())
+        self.assertEqual([activity.id for activity in back], newest_first[:2])
+        self.assertFalse(back.has_previous())
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.run = create_activity(notes='Hill, "steep"\nsecond line')
+        self.swim = create_activity(activity_type=ActivityType.SWIM)
+        Activity.objects.filter(pk=self.swim.pk).update(
+            status=ProcessingStatus.COMPLETED, created_at=timezone.now() - timedelta(days=10)
+        )
+
+    def export(self, fmt='csv', compress=False, **filters):
+        return b''.join(export.export_blocks(export.build_export_queryset(**filters), fmt, compress))
+
+    def test_csv_quotes_notes(self):
+        rows = list(csv.reader(io.StringIO(self.export().decode(), newline='')))
+
+        self.assertEqual(tuple(rows[0]), export.EXPORT_FIELDS)
+        self.assertEqual([int(row[0]) for row in rows[1:]], [self.run.id, self.swim.id])
+        self.assertEqual(rows[1][export.EXPORT_FIELDS.index('notes')], 'Hill, "steep"\nsecond line')
+
+    def test_ndjson_rows(self):
+        rows = [json.loads(line) for line in self.export('ndjson').decode().splitlines()]
+
+        self.assertEqual([row['id'] for row in rows], [self.run.id, self.swim.id])
+        self.assertEqual(rows[0]['notes'], self.run.notes)
+        self.assertEqual(rows[0]['weight_kg'], '70.00')
+        self.assertEqual(datetime.fromisoformat(rows[0]['created_at']), self.run.created_at)
+
+    def test_gzip_round_trip(self):
+        for fmt in export.EXPORT_FORMATS:
+            self.assertEqual(gzip.decompress(self.export(fmt, compress=True)), self.export(fmt))
+
+    def test_filters(self):
+        def exported_ids(**filters):
+            rows = self.export('ndjson', **filters).decode().splitlines()
+            return [json.loads(line)['id'] for line in rows]
+
+        today = timezone.localdate()
+        self.assertEqual(exported_ids(date_from=today), [self.run.id])
+        self.assertEqual(exported_ids(date_to=today - timedelta(days=1)), [self.swim.id])
+        self.assertEqual(exported_ids(status=ProcessingStatus.COMPLETED), [self.swim.id])
+        self.assertEqual(exported_ids(activity_type=ActivityType.RUN), [self.run.id])
+
+    def test_invalid_parameters_return_400(self):
+        for params in ({'format': 'xml'}, {'status': 'DONE'}, {'from': '2025-13-01'}, {'type': 'fly'}):
+            response = self.client.get(reverse('activity-export'), params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+    def test_wsgi_response_is_streamed_as_sync_iterator(self):
+        with warnings.catch_warnings():
+            # Django warns when it has to read an async iterator whole under WSGI
+            warnings.simplefilter('error')
+            response = self.client.get(reverse('activity-export'), {'format': 'ndjson'})
+            self.assertFalse(response.is_async)
+            self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 2)
+
+    async def test_asgi_response_is_streamed_as_async_iterator(self):
+        response = await self.async_client.get(reverse('activity-export'), {'gzip': '1'})
+
+        self.assertTrue(response.is_async)
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        content = b''.join([block async for block in response.streaming_content])
+        rows = list(csv.reader(io.StringIO(gzip.decompress(content).decode(), newline='')))
+        self.assertEqual(len(rows), 3)
+
+
+class QueueDepthTests(SimpleTestCase):
+
+    def test_autoscaler_sets_queue_depth_gauge_while_disabled(self):
+        depths = {
+            'celery': dict.fromkeys(ProcessingLane.values, 7),
+            'asyncio': dict.fromkeys(ProcessingLane.values, 2),
+        }
+        configs = {'AUTOSCALE_ENABLED': False}
+        with mock.patch.object(lanes, 'get_queue_depths', return_value=depths), \
+                mock.patch.object(autoscale, 'get_configs', return_value=configs), \
+                mock.patch.object(autoscale, 'get_lane_concurrency', return_value=2), \
+                mock.patch.object(autoscale.LaneAutoscaler, 'sample_batch_time', return_value=1.0):
+            autoscale.LaneAutoscaler(app=mock.Mock()).step()
+
+        self.assertEqual(metrics.QUEUE_DEPTH.labels(lane=ProcessingLane.BULK, backend='celery')._value.get(), 7)
+        self.assertEqual(metrics.QUEUE_DEPTH.labels(lane=ProcessingLane.BULK, backend='asyncio')._value.get(), 2)
+
+
+class MetricsArchiveTests(SimpleTestCase):
+
+    def write_counter(self, path, pid, value):
+        values = MmapedDict(os.path.join(path, f"counter_{pid}.db"))
+        values.write_value(mmap_key('requests', 'requests_total', (), (), 'Requests'), value, 0.0)
+        values.close()
+
+    def test_only_dead_process_files_are_archived(self):
+        dead = subprocess.Popen([sys.executable, '-c', 'pass'])
+        dead.wait()
+        live_pid = os.getppid()
+
+        with tempfile.TemporaryDirectory() as path:
+            self.write_counter(path, dead.pid, 3.0)
+            self.write_counter(path, live_pid, 5.0)
+
+            self.assertEqual(metrics.archive_dead_process_metrics(path), [dead.pid])
+
+            self.assertEqual(
+                sorted(os.listdir(path)),
+                sorted(['.archive.lock', 'counter_archive.db', f"counter_{live_pid}.db"])
+            )
+            archived = MmapedDict.read_all_values_from_file(os.path.join(path, 'counter_archive.db'))
+            self.assertEqual([value for _, value, _, _ in archived], [3.0])
@@ -8,5 +8,9 @@ urlpatterns = [
 
     path('api/activity/<int:pk>/status/', views.activity_status_api, name='activity-status-api'),
     path('api/activities/status/', views.activity_list_api, name='activity-list-api'),
+    path('api/activities/status/stream/', views.activity_status_stream, name='activity-status-stream'),
+    path('api/activities/bulk/', views.activity_bulk_api, name='activity-bulk-api'),
+    path('api/stats/', views.activity_stats_api, name='activity-stats-api'),
+    path('api/activities/export/', views.activity_export, name='activity-export'),
     path('metrics-json/', views.metrics_json, name='metrics-json'),
 ]
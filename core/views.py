@@ -1,25 +1,56 @@
 from django.shortcuts import render
 
+import asyncio
+import json
 import logging
-from django.shortcuts import get_object_or_404
+import time
+from datetime import date
 from django.contrib import messages
 from django.views.generic import ListView, DetailView, CreateView
 from django.urls import reverse_lazy
-from .models import Activity
+from .models import Activity, ActivityRollup
 from .forms import ActivityForm
 from .enums import ProcessingStatus
 
 from django.db import transaction
-from .tasks import process_activity
+from .outbox import enqueue_for_processing
 
-from django.http import JsonResponse
-from .monitoring import get_counter
-
-from realtime_config.realtime_config import get_config
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_POST
+from .ingest import ingest_activities, parse_rows
+from .export import build_export_queryset, export_blocks, export_filename, EXPORT_FORMATS
+from asgiref.sync import sync_to_async
+from .lanes import get_queue_depths
+from .monitoring import get_counters
+from .pagination import paginate_by_cursor
+from .status_counts import get_status_counts
+from .status_cache import get_status_payload, get_status_payloads, payloads_etag, is_terminal
+from .events import broadcaster
 
 
 logger = logging.getLogger(__name__)
 
+# Comment line sent to idle status streams to keep proxies from closing them
+stream_heartbeat_s = 15.0
+# Status streams are closed after this long, EventSource reconnects and gets a fresh snapshot.
+# Django 4.2 doesn't end a stream when its client disconnects, this bounds an abandoned one, s
+stream_max_lifetime_s = 5 * 60
+# Reconnect delay sent to EventSource clients, ms
+stream_retry_ms = 1000
+# Most activities per activity_list_api page
+api_page_limit = 500
+# Most rows accepted by one activity_bulk_api request
+bulk_max_rows = 50000
+# Largest activity_bulk_api body, this view reads past DATA_UPLOAD_MAX_MEMORY_SIZE (2.5 MB), bytes
+bulk_max_body_bytes = 16 * 1024 * 1024
+# Browser cache lifetime of status responses with only COMPLETED activities, s
+terminal_max_age_s = 24 * 3600
+
 
 class ActivityListView(ListView):
     """
@@ -33,17 +64,28 @@ class ActivityListView(ListView):
         """
         Realtime config for activities display per page.
         """
-        return int(get_config('ACTIVITIES_PER_PAGE', 9))
-    
+        return int(self.request.config.ACTIVITIES_PER_PAGE)
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Keyset pagination by ?after= / ?before= cursors instead of page numbers.
+        """
+        page = paginate_by_cursor(
+            queryset, page_size,
+            after=self.request.GET.get('after'),
+            before=self.request.GET.get('before')
+        )
+        return (None, page, page.object_list, page.has_other_pages())
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['pending_count'] = Activity.objects.filter(
-            status=ProcessingStatus.PENDING
-        ).count()
+        # One HGETALL instead of COUNT(*) queries
+        status_counts = get_status_counts()
+        context['pending_count'] = status_counts[ProcessingStatus.PENDING]
+        context['total_count'] = sum(status_counts.values())
 
         # Realtime config
-        context['polling_interval'] = float(get_config('ACTIVITY_POLLING_S', 2.0)) \
-            * 1000
+        context['polling_interval'] = float(self.request.config.ACTIVITY_POLLING_S) * 1000
         return context
 
 
@@ -67,51 +109,24 @@ class ActivityCreateView(CreateView):
     
     def form_valid(self, form):
         """
-        Saves form after submission if it's valid. Calls celery task.
+        Saves form after submission if it's valid.
+        Processing is queued by the outbox relay, no broker call in the request.
         """
 
-        # Ensure both or neither saving model and queuing task
+        # Ensure both or neither saving model and recording it for processing
         with transaction.atomic():
             # Save form normally
             response = super().form_valid(form)
             # Get the new activity instance
             activity = self.object
 
-            try:
-                # Queue task with default options and get its id
-                task_result = process_activity.delay(activity.id)
-
-                # Store id in the model
-                activity.celery_task_id = task_result.id
-                activity.save(update_fields=['celery_task_id'])
-
-                # Log the creation
-                logger.info(
-                    f"New activity created: {activity.id} ({activity.activity_type}), "
-                    f"and queued for processing with task {task_result.id}"
-                )
-            except Exception as e:
-                logger.info(f"Processing activity {activity.id} synchronously "
-                            "due to Redis unavailability")
-                try:
-                    activity.update_status(ProcessingStatus.PROCESSING)
-                    calories = activity.calculate_calories()
-                    if calories is not None:
-                        activity.update_status(ProcessingStatus.COMPLETED, calories=calories)
-                        messages.success(self.request, "Activity processed locally (Redis unavailable)")
-                    else:
-                        activity.update_status(
-                            ProcessingStatus.FAILED, 
-                            error_msg="Failed to calculate calories"
-                        )
-                        messages.warning(self.request, "Could not calculate calories")
-                except Exception as process_error:
-                    logger.error(f"Error processing activity synchronously: {process_error}")
-                    activity.update_status(
-                        ProcessingStatus.FAILED, 
-                        error_msg=f"Local processing error: {str(process_error)}"
-                    )
-                    messages.error(self.request, "Failed to process activity")           
+            enqueue_for_processing([activity.id])
+
+            # Log the creation
+            logger.info(
+                "New activity created: %s (%s), recorded for processing",
+                activity.id, activity.activity_type
+            )
 
         messages.success(
             self.request, 
@@ -123,19 +138,10 @@ class ActivityCreateView(CreateView):
 
 # Real-time update
 
-def activity_status_api(request, pk):
-    activity = get_object_or_404(Activity, pk=pk)
-    return JsonResponse({
-        'status': activity.status,
-        'status_display': activity.get_status_display(),
-        'calories': float(activity.calories_burned) if activity.calories_burned else None,
-        'processed_at': activity.processed_at.isoformat() if activity.processed_at else None,
-        'error': activity.error_message or None,
-        'updated_at': activity.updated_at.isoformat(),
-    })
-
-def activity_list_api(request):
-    raw_ids = request.GET.get('ids', '')
+def parse_ids(raw_ids):
+    """
+    Parse comma separated activity ids, skip invalid ones.
+    """
     valid_ids = []
     
     for id_str in raw_ids.split(','):
@@ -144,24 +150,249 @@ def activity_list_api(request):
                 valid_ids.append(int(id_str))
         except (ValueError, TypeError):
             continue
-    
-    activities = Activity.objects.filter(pk__in=valid_ids) if valid_ids else []
+    return valid_ids
+
+def conditional_status_response(request, data, payloads):
+    """
+    JSON response validated by ETag/Last-Modified of the payloads, 304 if the client has it.
+    Finished activities don't change, clients may keep them without asking.
+    """
+    response = JsonResponse(data)
+    etag = payloads_etag(payloads)
+    response['ETag'] = etag
+
+    last_modified = None
+    if payloads:
+        last_modified = int(max(parse_datetime(payload['updated_at']) for payload in payloads).timestamp())
+        response['Last-Modified'] = http_date(last_modified)
+
+    if is_terminal(payloads):
+        response['Cache-Control'] = f"max-age={terminal_max_age_s}"
+    else:
+        response['Cache-Control'] = 'no-cache'
+
+    return get_conditional_response(request, etag=etag, last_modified=last_modified, response=response)
+
+def activity_status_api(request, pk):
+    """
+    Status of one activity from the status cache, no query for cached activities.
+    """
+    payload = get_status_payload(pk)
+    if payload is None:
+        raise Http404("Activity not found")
+    return conditional_status_response(request, payload, [payload])
+
+def activity_list_api(request):
+    """
+    Statuses of given activity ids.
+    Without ids, a page of all activities newest first: ?after=/?before= cursor, ?limit=.
+    """
+    valid_ids = parse_ids(request.GET.get('ids', ''))
+
+    if not valid_ids:
+        try:
+            limit = int(request.GET.get('limit', ''))
+        except ValueError:
+            limit = int(request.config.ACTIVITIES_PER_PAGE)
+        page = paginate_by_cursor(
+            Activity.objects.all(), max(1, min(limit, api_page_limit)),
+            after=request.GET.get('after'),
+            before=request.GET.get('before')
+        )
+        return JsonResponse({
+            'results': [activity.status_payload() for activity in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+            'count': sum(get_status_counts().values()),
+        })
+
+    payloads = list(get_status_payloads(valid_ids).values())
     data = {
-        str(activity.id): {
-            'status': activity.status,
-            'status_display': activity.get_status_display(),
-            'calories': float(activity.calories_burned) if activity.calories_burned else None
+        str(payload['id']): {
+            'status': payload['status'],
+            'status_display': payload['status_display'],
+            'calories': payload['calories']
         }
-        for activity in activities
+        for payload in payloads
     }
-    return JsonResponse(data)
+    return conditional_status_response(request, data, payloads)
+
+async def activity_status_stream(request):
+    """
+    Server-sent events with status transitions of given activity ids, all if none given.
+    Starts with current state of the ids, then pushes changes published by update_status.
+    Ends after stream_max_lifetime_s, the client reconnects.
+    Needs ASGI server.
+    """
+    ids = set(parse_ids(request.GET.get('ids', '')))
+
+    async def event_stream():
+        deadline = time.monotonic() + stream_max_lifetime_s
+        # Subscribe before the snapshot, so no transition falls in between
+        queue = broadcaster.subscribe()
+        try:
+            yield f"retry: {stream_retry_ms}\n\n"
+            if ids:
+                async for activity in Activity.objects.filter(pk__in=ids):
+                    yield f"event: status\ndata: {json.dumps(activity.status_payload())}\n\n"
+
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=min(stream_heartbeat_s, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+
+                # Disconnected as too slow
+                if event is None:
+                    break
+                if ids and event.get('id') not in ids:
+                    continue
+                yield f"event: status\ndata: {json.dumps(event)}\n\n"
+        finally:
+            broadcaster.unsubscribe(queue)
+
+    response = StreamingHttpResponse(event_stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Don't let nginx buffer the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@csrf_exempt
+@require_POST
+def activity_bulk_api(request):
+    """
+    Create many activities from a JSON array or NDJSON body (Content-Type: application/x-ndjson).
+    Rows are validated like the activity form, valid rows are created and queued,
+    invalid ones reported back by index.
+    """
+    try:
+        content_length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        content_length = 0
+    # Read from the stream, request.body refuses bodies over DATA_UPLOAD_MAX_MEMORY_SIZE
+    body = b'' if content_length > bulk_max_body_bytes else request.read(bulk_max_body_bytes + 1)
+    if content_length > bulk_max_body_bytes or len(body) > bulk_max_body_bytes:
+        return JsonResponse(
+            {'error': f"Body too large, at most {bulk_max_body_bytes} bytes per request"}, status=413
+        )
+
+    try:
+        rows = list(parse_rows(body, request.content_type or ''))
+    except (ValueError, UnicodeDecodeError) as e:
+        return JsonResponse({'error': f"Invalid body: {e}"}, status=400)
+
+    if len(rows) > bulk_max_rows:
+        return JsonResponse(
+            {'error': f"Too many rows: {len(rows)}, at most {bulk_max_rows} per request"},
+            status=413
+        )
+
+    result = ingest_activities(rows)
+    logger.info(f"Bulk request created {result['created']} activities, "
+                f"{result['invalid']} invalid rows")
+    return JsonResponse(result, status=201 if result['created'] else 400)
+
+
+def activity_stats_api(request):
+    """
+    Calorie and duration totals from rollup tables.
+    ?period=day|week (default day), ?from= / ?to= dates (YYYY-MM-DD, inclusive), ?type= activity type.
+    """
+    period = request.GET.get('period', ActivityRollup.PERIOD_DAY)
+    if period not in ActivityRollup.PERIODS:
+        return JsonResponse({'error': f"Invalid period: {period}"}, status=400)
+
+    rollups = ActivityRollup.objects.filter(period=period)
+    try:
+        if request.GET.get('from'):
+            rollups = rollups.filter(period_start__gte=date.fromisoformat(request.GET['from']))
+        if request.GET.get('to'):
+            rollups = rollups.filter(period_start__lte=date.fromisoformat(request.GET['to']))
+    except ValueError as e:
+        return JsonResponse({'error': f"Invalid date: {e}"}, status=400)
+    if request.GET.get('type'):
+        rollups = rollups.filter(activity_type=request.GET['type'])
+
+    results = [
+        {
+            'period_start': period_start.isoformat(),
+            'activity_type': activity_type,
+            'activities': activity_count,
+            'duration_minutes': duration_minutes,
+            'calories': float(calories_burned),
+        }
+        for period_start, activity_type, activity_count, duration_minutes, calories_burned
+        in rollups.order_by('period_start', 'activity_type').values_list(
+            'period_start', 'activity_type', 'activity_count', 'duration_minutes', 'calories_burned'
+        )
+    ]
+    return JsonResponse({
+        'period': period,
+        'results': results,
+        'totals': {
+            'activities': sum(row['activities'] for row in results),
+            'duration_minutes': sum(row['duration_minutes'] for row in results),
+            'calories': round(sum(row['calories'] for row in results), 2),
+        },
+    })
+
+
+async def _pull_blocks(blocks):
+    # Cursor is used from one thread, blocks are pulled one at a time
+    next_block = sync_to_async(next)
+    try:
+        while True:
+            block = await next_block(blocks, None)
+            if block is None:
+                break
+            if block:
+                yield block
+    finally:
+        await sync_to_async(blocks.close)()
+
+
+async def activity_export(request):
+    """
+    Stream activities as CSV or NDJSON: ?format=csv|ndjson, ?gzip=1,
+    ?from= / ?to= dates of creation (inclusive), ?status=, ?type=.
+    Rows are read from a server-side cursor and sent as they are encoded.
+    """
+    fmt = request.GET.get('format', 'csv')
+    compress = request.GET.get('gzip', '').lower() in ('1', 'true', 'yes')
+    if fmt not in EXPORT_FORMATS:
+        return JsonResponse({'error': f"Invalid format: {fmt}"}, status=400)
+    try:
+        queryset = build_export_queryset(
+            date_from=request.GET.get('from'),
+            date_to=request.GET.get('to'),
+            status=request.GET.get('status'),
+            activity_type=request.GET.get('type'),
+        )
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    blocks = export_blocks(queryset, fmt, compress)
+    # Each handler streams only its own kind of iterator, it reads the other whole before sending
+    content = blocks if isinstance(request, WSGIRequest) else _pull_blocks(blocks)
+
+    if compress:
+        content_type = 'application/gzip'
+    else:
+        content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+
+    response = StreamingHttpResponse(content, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{export_filename(fmt, compress)}"'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 def metrics_json(request):
-    data = {
-        'tasks_started': get_counter('tasks_started'),
-        'tasks_completed': get_counter('tasks_completed'),
-        'tasks_failed': get_counter('tasks_failed'),
-        'total_calories': get_counter('total_calories'),
-    }
+    data = get_counters()
+    data['status_counts'] = get_status_counts()
+    data['queue_depths'] = get_queue_depths()
     return JsonResponse(data)
@@ -25,7 +25,7 @@ class ConfigAppConfig(AppConfig):
         # Don't run init for basic manage.py commands
         management_commands: List[str] = [
             'makemigrations', 'migrate', 'collectstatic', 'check', 'shell', 'help',
-            'createsuperuser', 'loaddata', 'dumpdata'
+            'createsuperuser', 'loaddata', 'dumpdata', 'archive_metrics'
         ]
         command: Optional[str] = sys.argv[1] if len(sys.argv) > 1 else None
         is_management_command: bool = command in management_commands
@@ -61,6 +61,8 @@ class ConfigAppConfig(AppConfig):
             realtime_config.load_defaults()
             logger.info(f"PID {pid}: Loaded constance config defaults")
 
+            realtime_config.warm_cache()
+
             config_updated.connect(signals.config_updated_handler,
                                    dispatch_uid=f"config_updated_handler_{pid}")
             logger.info(f"PID {pid}: Successfully connected "
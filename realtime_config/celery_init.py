@@ -17,6 +17,7 @@ def init_worker_process(sender=None, **kwargs):
     
     from . import realtime_config
     realtime_config.load_defaults()
+    realtime_config.warm_cache()
     realtime_config.start_subscriber_thread()
     
     _worker_initialized_pids[pid] = True
@@ -0,0 +1,151 @@
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+
+from typing import Any, Dict, Optional, Tuple
+
+
+# Realtime config with sampling rates by logger name prefix, JSON object
+SAMPLE_RATES_CONFIG: str = 'LOG_SAMPLE_RATES'
+
+# LogRecord attributes that aren't extra fields
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per line: time, level, logger, process, thread, message,
+    exception and extra fields passed with extra={...}.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        data: Dict[str, Any] = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'process': record.process,
+            'thread': record.threadName,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            data['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data['exception'] = record.exc_text
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                data[key] = value
+        return json.dumps(data, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep a fraction of records below WARNING, per logger name prefix:
+    LOG_SAMPLE_RATES realtime config, e.g. {"core.tasks": 0.1, "realtime_config.middleware": 0.01},
+    the longest matching prefix wins, loggers without a match keep everything.
+    """
+
+    def __init__(self, name: str = '') -> None:
+        super().__init__(name)
+        # Parsed rates and the generation they were read at, one tuple so threads
+        # never see rates paired with another key
+        self._cached: Tuple[Optional[Tuple[str, int]], Tuple[Tuple[str, float], ...]] = (None, ())
+        # get_config may log, don't sample its records while sampling
+        self._local = threading.local()
+
+    def _get_rates(self) -> Tuple[Tuple[str, float], ...]:
+        # Imported late: filters are built while Django configures logging, before apps load
+        from .realtime_config import current_config_snapshot, get_cache_snapshot, get_config
+
+        # Config is read and parsed again only when the generation changes. Snapshots are built
+        # per request and task, keyed by the generation they were captured at, not by identity
+        request_snapshot = current_config_snapshot()
+        generation, cache = get_cache_snapshot()
+        key: Optional[Tuple[str, int]] = ('cache', generation) if request_snapshot is None \
+            else ('snapshot', request_snapshot.generation)
+        cached_key, rates = self._cached
+        if cached_key == key:
+            return rates
+
+        raw: Any = get_config(SAMPLE_RATES_CONFIG, '{}')
+        try:
+            parsed: Dict[str, Any] = json.loads(raw) if isinstance(raw, str) else dict(raw)
+            # Longest prefix first
+            rates = tuple(sorted(
+                ((prefix, float(rate)) for prefix, rate in parsed.items()),
+                key=lambda item: len(item[0]), reverse=True
+            ))
+        except (TypeError, ValueError):
+            rates = ()
+
+        # Fallback values aren't kept: read again until the config reaches the local cache
+        if SAMPLE_RATES_CONFIG not in cache:
+            key = None
+        self._cached = (key, rates)
+        return rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or getattr(self._local, 'active', False):
+            return True
+
+        self._local.active = True
+        try:
+            rates = self._get_rates()
+        finally:
+            self._local.active = False
+
+        name: str = record.name
+        for prefix, rate in rates:
+            if name == prefix or name.startswith(prefix + '.'):
+                return rate >= 1.0 or random.random() < rate
+        return True
+
+
+class QueueLogHandler(logging.handlers.QueueHandler):
+    """
+    Non-blocking handler: records go to an in-process queue, a QueueListener thread
+    formats and writes them to stderr, so callers never format or wait on the stream.
+    The listener is restarted in forked children (Celery prefork pool).
+    """
+
+    def __init__(self) -> None:
+        super().__init__(queue.SimpleQueue())
+        self.target: logging.Handler = logging.StreamHandler()
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self._start_listener()
+        os.register_at_fork(after_in_child=self._restart_listener)
+
+    def _start_listener(self) -> None:
+        self.listener = logging.handlers.QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+
+    def _restart_listener(self) -> None:
+        # Listener thread of the parent doesn't exist in the child, records queued before fork are dropped
+        self.queue = queue.SimpleQueue()
+        self._start_listener()
+
+    def close(self) -> None:
+        # Called by logging.shutdown at exit, stopping the listener writes queued records
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+        self.target.close()
+        super().close()
+
+    def setFormatter(self, fmt: Optional[logging.Formatter]) -> None:
+        # Formatting happens in the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, formatting stays in the listener thread. The message is merged now,
+        # like the stdlib QueueHandler does, so later changes to mutable args don't show up in the log
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
@@ -2,8 +2,11 @@ import logging
 import os
 
 from typing import Callable
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import HttpRequest, HttpResponse
 
+from .realtime_config import config_snapshot
+
 logger = logging.getLogger(__name__)
 
 
@@ -12,9 +15,36 @@ class LogRequestPIDMiddleware:
         self.get_response = get_response
 
     def __call__(self, request: HttpRequest) -> HttpResponse:
-        pid: int = os.getpid()
-        logger.info(f"MIDDLEWARE - PID {pid} - request {request.method} {request.path}")
+        # Lazy %-formatting, most of these records are dropped by LOG_SAMPLE_RATES
+        logger.info("MIDDLEWARE - PID %s - request %s %s", os.getpid(), request.method, request.path)
         
         response: HttpResponse = self.get_response(request)
         return response
-    
\ No newline at end of file
+    
+
+class ConfigSnapshotMiddleware:
+    """
+    Capture all configs once per request: request.config.KEY reads the snapshot,
+    get_config/get_configs read it too for the rest of the request (contextvar),
+    so values are consistent even if a config changes mid-request.
+    """
+    sync_capable: bool = True
+    async_capable: bool = True
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with config_snapshot() as snapshot:
+            request.config = snapshot
+            return self.get_response(request)
+
+    async def __acall__(self, request: HttpRequest) -> HttpResponse:
+        with config_snapshot() as snapshot:
+            request.config = snapshot
+            return await self.get_response(request)
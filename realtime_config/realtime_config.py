@@ -1,6 +1,11 @@
 import threading
 import os
+import json
 import logging
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
 from django.conf import settings
 from constance import config as constance_config
 import redis
@@ -8,13 +13,20 @@ import time
 
 from .redis_client import get_redis_connection
 
-from typing import Any, Union, Optional, Dict, Tuple
+from types import MappingProxyType
+from typing import Any, Callable, Iterator, Union, Optional, Dict, Tuple, Iterable, Mapping
 
 
 logger = logging.getLogger(__name__)
 
+# Immutable snapshot of cached configs: never mutated, replaced as a whole on change.
+# Readers don't lock, writers serialize on _cache_lock and bump the generation.
 _local_cache: Dict[str, Any] = {}
+_cache_generation: int = 0
 _cache_lock: threading.Lock = threading.Lock()
+# Generation at which a key was last invalidated, to drop stale fetches
+_invalidated_at: Dict[str, int] = {}
+_MISSING: Any = object()
 # Fill in AppConfig.ready() with load_defaults()
 _default_values: Dict[str, Any] = {}
 
@@ -26,6 +38,13 @@ _redis_available: bool = True
 _last_redis_error_time: float = 0.0
 _redis_status_lock = threading.Lock()
 
+# Config change versions seen by this process, written by the subscriber thread only
+_last_seen_version: int = 0
+_key_versions: Dict[str, int] = {}
+
+# Snapshot of the current request or task, consulted first by get_config(s)
+_config_snapshot: ContextVar[Optional['ConfigSnapshot']] = ContextVar('config_snapshot', default=None)
+
 
 def load_defaults() -> None:
     """
@@ -45,60 +64,89 @@ def load_defaults() -> None:
         _default_values = {}
 
 
+def get_cache_snapshot() -> Tuple[int, Mapping[str, Any]]:
+    """
+    Return current cache generation and read-only view of its snapshot.
+    """
+    return _cache_generation, MappingProxyType(_local_cache)
+
+
+def _update_cache(values: Dict[str, Any], removed: Iterable[str] = (),
+                  fetched_at_generation: Optional[int] = None) -> int:
+    """
+    Publish new snapshot with removed keys dropped, then values set.
+    Values fetched at fetched_at_generation are skipped for keys invalidated since then.
+    Return new generation.
+    """
+    global _local_cache, _cache_generation
+
+    with _cache_lock:
+        if fetched_at_generation is not None:
+            values = {key: value for key, value in values.items()
+                      if _invalidated_at.get(key, 0) <= fetched_at_generation}
+
+        new_cache: Dict[str, Any] = dict(_local_cache)
+
+        generation: int = _cache_generation + 1
+        for key in removed:
+            new_cache.pop(key, None)
+            _invalidated_at[key] = generation
+
+        new_cache.update(values)
+
+        # Readers see either the old or the new snapshot, never a partial one
+        _local_cache = new_cache
+        _cache_generation = generation
+        return generation
+
+
 def get_config(key: str, default: Any = None) -> Any:
     """
     Get config value by key with caching.
 
-    - Return local cache if there is any
+    - Return local cache if there is any, lock-free
     - Or try to get config from Redis:
      - save and return on success
      - otherwise, return default if given, or default from constance_config
     """
-    global _redis_available, _last_redis_error_time
-
-    current_pid: int = os.getpid()
+    # Inside a request or task: values captured at its start
+    request_snapshot: Optional[ConfigSnapshot] = _config_snapshot.get()
+    if request_snapshot is not None:
+        value: Any = request_snapshot.__dict__.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
 
-    with _cache_lock:
-        if key in _local_cache:
-            logger.debug(f"Config {key} retrieved from local cache - "
-                         f"{_local_cache[key]} (PID: {current_pid})")
-            return _local_cache[key]
+    # Hot path: one dict read on the current snapshot
+    value = _local_cache.get(key, _MISSING)
+    if value is not _MISSING:
+        return value
 
-    logger.debug(f"Cache miss for config '{key}' (PID: {current_pid})")
+    current_pid: int = os.getpid()
+    fetched_at_generation: int = _cache_generation
+    logger.debug("Cache miss for config '%s' (PID: %s)", key, current_pid)
 
     # Fail fast if going for Redis
-    
-    with _redis_status_lock:
-        current_redis_available: bool = _redis_available
-        current_last_error_time: float = _last_redis_error_time
 
-    current_time: float = time.time()
-    redis_retry_interval: float = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
-
-    if not current_redis_available and \
-       (current_time - current_last_error_time) < redis_retry_interval:
+    backoff_remaining: float = _redis_backoff_remaining()
+    if backoff_remaining > 0:
         logger.warning(f"Redis marked unavailable (PID: {current_pid}) - "
                        "not attempting connection for another "
-                       f"{(redis_retry_interval - (current_time - current_last_error_time)):.1f}s")
+                       f"{backoff_remaining:.1f}s")
     # Attempting to connect to Redis
     else:
         try:
-            value: Any = getattr(constance_config, key)
-            with _redis_status_lock:
-                _redis_available = True
-
-            with _cache_lock:
-                _local_cache[key] = value
-            logger.debug(f"Fetched config '{key}' from Redis and cached - {value} "
-                         "(PID: {current_pid})")
+            value = getattr(constance_config, key)
+            _set_redis_available(True)
+
+            _update_cache({key: value}, fetched_at_generation=fetched_at_generation)
+            logger.debug("Fetched config '%s' from Redis and cached - %s (PID: %s)",
+                         key, value, current_pid)
             return value
 
         except redis.exceptions.RedisError as e:
             logger.warning(f"Redis operation failed for config '{key}' "
                            "(PID: {current_pid}). Error: {e}")
-            with _redis_status_lock:
-                _redis_available = False
-                _last_redis_error_time = current_time
+            _set_redis_available(False)
 
         except AttributeError:
             logger.error(f"Config '{key}' not found in Constance (PID: {current_pid})")
@@ -123,6 +171,283 @@ def get_config(key: str, default: Any = None) -> Any:
     return None
 
 
+def get_configs(keys: Iterable[str]) -> Dict[str, Any]:
+    """
+    Get several config values by keys with caching.
+
+    - Return local cache for keys that are there
+    - Fetch all the missing keys from Redis in one round trip and cache them
+    - Fall back to preloaded defaults if Redis fails
+    """
+    keys = list(keys)
+    request_snapshot: Optional[ConfigSnapshot] = _config_snapshot.get()
+    snapshot: Mapping[str, Any] = request_snapshot.__dict__ if request_snapshot is not None \
+        else _local_cache
+
+    values: Dict[str, Any] = {}
+    missing: list[str] = []
+    for key in keys:
+        value: Any = snapshot.get(key, _MISSING)
+        if value is _MISSING:
+            missing.append(key)
+        else:
+            values[key] = value
+
+    if missing:
+        fetched: Optional[Dict[str, Any]] = _fetch_configs(missing)
+        if fetched is not None:
+            values.update(fetched)
+        for key in missing:
+            if key not in values:
+                logger.warning(f"Fallback for config '{key}' to preloaded default")
+                values[key] = _default_values.get(key)
+
+    return {key: values[key] for key in keys}
+
+
+class ConfigSnapshot:
+    """
+    Immutable values of all configs at one moment, read as attributes:
+    snapshot.ACTIVITIES_PER_PAGE. Values are plain instance attributes, no lookup logic.
+    """
+
+    def __init__(self, values: Mapping[str, Any], generation: int) -> None:
+        self.__dict__.update(values)
+        object.__setattr__(self, '_generation', generation)
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: str, default: Any = None) -> Any:
+        return self.__dict__.get(key, default)
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError("ConfigSnapshot is immutable")
+
+    def __repr__(self) -> str:
+        return f"<ConfigSnapshot generation {self._generation}>"
+
+
+def capture_config_snapshot() -> ConfigSnapshot:
+    """
+    Snapshot of all constance configs: the local cache as it is now,
+    keys missing from it fetched in one round trip.
+    """
+    generation: int = _cache_generation
+    cache: Dict[str, Any] = _local_cache
+    keys: Iterable[str] = getattr(settings, 'CONSTANCE_CONFIG', {}).keys()
+
+    values: Dict[str, Any] = dict(cache)
+    missing: list[str] = [key for key in keys if key not in cache]
+    if missing:
+        values.update(get_configs(missing))
+    return ConfigSnapshot(values, generation)
+
+
+def current_config_snapshot() -> Optional[ConfigSnapshot]:
+    """
+    Snapshot of the current request or task, None outside of one.
+    """
+    return _config_snapshot.get()
+
+
+@contextmanager
+def config_snapshot() -> Iterator[ConfigSnapshot]:
+    """
+    Capture a snapshot and make get_config read from it inside the with block.
+    Scoped by contextvars: per thread, and per asyncio task.
+    """
+    snapshot: ConfigSnapshot = capture_config_snapshot()
+    token = _config_snapshot.set(snapshot)
+    try:
+        yield snapshot
+    finally:
+        _config_snapshot.reset(token)
+
+
+def with_config_snapshot(func: Callable) -> Callable:
+    """
+    Decorator for Celery tasks (below @shared_task) and other functions:
+    config reads are consistent for one call.
+    """
+    if iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+            with config_snapshot():
+                return await func(*args, **kwargs)
+        return async_wrapper
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with config_snapshot():
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def warm_cache() -> None:
+    """
+    Fill local cache with all constance configs in one Redis round trip.
+    """
+    keys: list[str] = list(getattr(settings, 'CONSTANCE_CONFIG', {}).keys())
+    fetched: Optional[Dict[str, Any]] = _fetch_configs(keys)
+    if fetched is None:
+        logger.warning(f"Could not warm config cache (PID: {os.getpid()}), "
+                       "configs will be fetched on first use")
+        return
+    logger.info(f"Warmed config cache with {len(fetched)} keys (PID: {os.getpid()})")
+
+
+def _fetch_configs(keys: list[str]) -> Optional[Dict[str, Any]]:
+    """
+    Fetch configs from constance backend with one MGET and cache them.
+    Keys not stored in Redis get constance defaults, like getattr(constance_config).
+    Return None if Redis is unavailable.
+    """
+    if _redis_backoff_remaining() > 0:
+        return None
+
+    fetched_at_generation: int = _cache_generation
+    constance_defs: Dict[str, Tuple[Any, str, type]] = \
+        getattr(settings, 'CONSTANCE_CONFIG', {})
+
+    try:
+        stored: Dict[str, Any] = dict(constance_config._backend.mget(keys))
+        _set_redis_available(True)
+    except redis.exceptions.RedisError as e:
+        logger.warning(f"Redis MGET failed for {len(keys)} configs "
+                       f"(PID: {os.getpid()}). Error: {e}")
+        _set_redis_available(False)
+        return None
+    except Exception as e:
+        logger.error(f"Unexpected error getting configs {keys} "
+                     f"(PID: {os.getpid()}): {e}", exc_info=True)
+        return None
+
+    values: Dict[str, Any] = {}
+    for key in keys:
+        if key in stored:
+            values[key] = stored[key]
+        elif key in constance_defs:
+            values[key] = constance_defs[key][0]
+        else:
+            logger.error(f"Config '{key}' not found in Constance (PID: {os.getpid()})")
+
+    _update_cache(values, fetched_at_generation=fetched_at_generation)
+    return values
+
+
+def get_config_version(redis_client: redis.Redis) -> int:
+    """
+    Return latest config change version published to Redis.
+    """
+    version_key: str = getattr(settings, 'REDIS_CONFIG_VERSION_KEY', 'realtime_config_version')
+    return int(redis_client.get(version_key) or 0)
+
+
+def resync(redis_client: redis.Redis) -> bool:
+    """
+    Reload all configs and set every key to the current config version.
+    Called on (re)subscribe and when a version gap shows missed messages.
+    """
+    global _last_seen_version
+
+    # Version read before values, so values are at least this new
+    version: int = get_config_version(redis_client)
+    values: Optional[Dict[str, Any]] = _fetch_configs(
+        list(getattr(settings, 'CONSTANCE_CONFIG', {}).keys())
+    )
+    if values is None:
+        logger.warning(f"Config resync failed (PID: {os.getpid()})")
+        return False
+
+    for key in values:
+        _key_versions[key] = max(_key_versions.get(key, 0), version)
+    _last_seen_version = max(_last_seen_version, version)
+    logger.info(f"Resynced {len(values)} configs at version {version} (PID: {os.getpid()})")
+    return True
+
+
+def handle_config_message(data: Union[bytes, str, None],
+                          redis_client: redis.Redis) -> None:
+    """
+    Apply one config change message to the local cache.
+
+    Message is JSON with key, version, origin and value if it could be serialized.
+    - Older version than cached for the key: ignored
+    - With value: cache updated in place, no Redis read
+    - Without value or legacy plain key: key invalidated
+    - Version gap: missed messages, resync all configs
+    """
+    global _last_seen_version
+
+    raw: str = data.decode('utf-8') if isinstance(data, bytes) else str(data or "")
+    if not raw:
+        return
+
+    try:
+        message: Any = json.loads(raw)
+    except ValueError:
+        message = None
+    if not isinstance(message, dict) or 'key' not in message:
+        # Legacy message with key name only
+        logger.info(f"Received update notification for key: {raw}")
+        _update_cache({}, removed=[raw])
+        return
+
+    key: str = message['key']
+    version: int = int(message.get('version') or 0)
+    logger.info(f"Received update for key: {key}, version {version} "
+                f"from {message.get('origin')}")
+
+    if version and version <= _key_versions.get(key, 0):
+        logger.debug(f"Ignoring old version {version} for key {key}")
+        return
+
+    if _last_seen_version and version > _last_seen_version + 1:
+        logger.warning(f"Config version gap {_last_seen_version} -> {version}, resyncing")
+        if resync(redis_client) and version <= _key_versions.get(key, 0):
+            return
+
+    if 'value' in message:
+        generation: int = _update_cache({key: message['value']}, removed=[key])
+        logger.info(f"Updated cached value for key: {key}, cache generation {generation}")
+    else:
+        generation = _update_cache({}, removed=[key])
+        logger.info(f"Invalidated cache for key: {key}, cache generation {generation}")
+
+    if version:
+        _key_versions[key] = version
+        _last_seen_version = max(_last_seen_version, version)
+
+
+def _redis_backoff_remaining() -> float:
+    """
+    Return seconds left before Redis may be tried again after a failure, 0 if it may.
+    """
+    with _redis_status_lock:
+        current_redis_available: bool = _redis_available
+        current_last_error_time: float = _last_redis_error_time
+
+    if current_redis_available:
+        return 0.0
+
+    redis_retry_interval: float = getattr(settings, 'REDIS_RETRY_INTERVAL', 10.0)
+    return max(0.0, redis_retry_interval - (time.time() - current_last_error_time))
+
+
+def _set_redis_available(available: bool) -> None:
+    global _redis_available, _last_redis_error_time
+
+    with _redis_status_lock:
+        _redis_available = available
+        if not available:
+            _last_redis_error_time = time.time()
+
+
 def run_subscriber() -> None:
     """
     Run Redis Pub/Sub subscriber that listens for config changes.
@@ -152,26 +477,13 @@ def run_subscriber() -> None:
             pubsub.subscribe(channel_name)
             logger.info(f"Subscribed to Redis channel: {channel_name}")
 
+            # Changes published while not subscribed are lost, catch up first
+            resync(redis_client)
+
             for message in pubsub.listen():
-                logger.debug(f"Subscriber received message: {message}")
+                logger.debug("Subscriber received message: %s", message)
                 if message and message['type'] == 'message' and 'data' in message:
-                    key = message.get('data')
-                    if isinstance(key, bytes):
-                        key = key.decode('utf-8')
-                    else:
-                        key = str(key) if key is not None else ""
-                    
-                    if key:
-                        logger.info(f"Received update notification for key: {key}")
-                        with _cache_lock:
-                            # logger.debug(f"PID: {os.getpid()}, cache before invalidation: {_local_cache}")
-                            removed_value: Any = _local_cache.pop(key, None)
-                            logger.info(f"PID {os.getpid()}, removed value: {removed_value}")
-
-                    if removed_value is not None:
-                        logger.info(f"Invalidated cache for key: {key}")
-                    else:
-                        logger.debug(f"Key {key} not found in cache, nothing to invalidate")
+                    handle_config_message(message.get('data'), redis_client)
                 else:
                      logger.warning(f"Received unexpected message format from Pub/Sub: {message}")
 
@@ -1,14 +1,35 @@
+import json
 import logging
+import os
+import socket
 import redis
 from django.conf import settings
 from .redis_client import get_redis_connection
 from .models import ConfigChangeLog
 
-from typing import Any, Optional
+from typing import Any, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
 
+def build_config_message(key: str, value: Any, version: int) -> str:
+    """
+    Serialize config change for Pub/Sub.
+    Value is left out if it isn't JSON serializable, subscribers then just invalidate the key.
+    """
+    message: Dict[str, Any] = {
+        'key': key,
+        'version': version,
+        'origin': f"{socket.gethostname()}:{os.getpid()}",
+        'value': value,
+    }
+    try:
+        return json.dumps(message)
+    except (TypeError, ValueError):
+        del message['value']
+        return json.dumps(message)
+
+
 def config_updated_handler(
         sender: Any,
         key: str,
@@ -17,7 +38,8 @@ def config_updated_handler(
         **kwargs: Any
     ) -> None:
     """
-    Call when constance config updates. Publish key to Redis Pub/Sub channel.
+    Call when constance config updates. Publish change to Redis Pub/Sub channel
+    with new value and version, so subscribers update their cache without reading Redis.
     + Log change to database.
     """
     logger.info(f"Signal config_updated received for key='{key}'. "
@@ -49,9 +71,15 @@ def config_updated_handler(
         return
 
     try:
-        got_msg_count: int = redis_client.publish(channel_name, key)
-        logger.info(f"Published key='{key}' to Redis channel '{channel_name}'. "
-                    f"Subscribers notified: {got_msg_count}")
+        version_key: str = getattr(settings, 'REDIS_CONFIG_VERSION_KEY',
+                                   'realtime_config_version')
+        # Constance has already stored the value, so this version covers it
+        version: int = redis_client.incr(version_key)
+
+        message: str = build_config_message(key, new_value, version)
+        got_msg_count: int = redis_client.publish(channel_name, message)
+        logger.info(f"Published key='{key}' version {version} to Redis channel "
+                    f"'{channel_name}'. Subscribers notified: {got_msg_count}")
 
     except redis.exceptions.RedisError as e:
         logger.error(f"Redis error during publishing for key='{key}'. Error: {e}",
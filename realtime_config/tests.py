@@ -1,3 +1,109 @@
-from django.test import TestCase
+import json
+import logging
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from . import log_handlers, realtime_config
+
+
+class ConfigMessageTests(SimpleTestCase):
+
+    def setUp(self):
+        # Versions seen by this process, isolated from the running subscriber
+        patches = [
+            mock.patch.object(realtime_config, '_last_seen_version', 5),
+            mock.patch.object(realtime_config, '_key_versions', {'SITE_NAME': 5}),
+            mock.patch.object(realtime_config, '_update_cache', return_value=1),
+            mock.patch.object(realtime_config, 'resync', return_value=True),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.redis_client = mock.Mock()
+
+    def send(self, **message):
+        realtime_config.handle_config_message(json.dumps(message).encode(), self.redis_client)
+
+    def test_next_version_is_applied_without_resync(self):
+        self.send(key='SITE_NAME', version=6, value='Next')
+
+        realtime_config.resync.assert_not_called()
+        realtime_config._update_cache.assert_called_once_with({'SITE_NAME': 'Next'}, removed=['SITE_NAME'])
+        self.assertEqual(realtime_config._last_seen_version, 6)
+
+    def test_version_gap_triggers_resync(self):
+        self.send(key='SITE_NAME', version=8, value='After gap')
+
+        realtime_config.resync.assert_called_once_with(self.redis_client)
+
+    def test_old_version_is_ignored(self):
+        self.send(key='SITE_NAME', version=4, value='Old')
+
+        realtime_config.resync.assert_not_called()
+        realtime_config._update_cache.assert_not_called()
+
+
+class SamplingFilterTests(SimpleTestCase):
+
+    def setUp(self):
+        self.sampling_filter = log_handlers.SamplingFilter()
+        self.cache = {log_handlers.SAMPLE_RATES_CONFIG: '{"core.tasks": 0}'}
+        patches = [
+            mock.patch.object(realtime_config, 'get_cache_snapshot', side_effect=lambda: (self.generation, self.cache)),
+            mock.patch.object(realtime_config, 'get_config', side_effect=lambda key, default=None: self.cache[key]),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.generation = 1
+
+    def record(self, name='core.tasks', level=logging.INFO):
+        return logging.LogRecord(name, level, __file__, 0, 'message', (), None)
+
+    def test_rates_are_read_once_per_cache_generation(self):
+        for _ in range(3):
+            self.assertFalse(self.sampling_filter.filter(self.record()))
+        self.assertTrue(self.sampling_filter.filter(self.record(name='core.views')))
+        self.assertTrue(self.sampling_filter.filter(self.record(level=logging.WARNING)))
+        self.assertEqual(realtime_config.get_config.call_count, 1)
+
+        self.generation = 2
+        self.cache = {log_handlers.SAMPLE_RATES_CONFIG: '{}'}
+        self.assertTrue(self.sampling_filter.filter(self.record()))
+        self.assertEqual(realtime_config.get_config.call_count, 2)
+
+    def use_snapshot(self, values, generation):
+        snapshot = realtime_config.ConfigSnapshot(values, generation)
+        token = realtime_config._config_snapshot.set(snapshot)
+        self.addCleanup(realtime_config._config_snapshot.reset, token)
+        realtime_config.get_config.side_effect = lambda key, default=None: snapshot.get(key)
+
+    def test_request_snapshots_are_read_once_per_generation(self):
+        # Every request and task captures its own snapshot
+        for _ in range(2):
+            self.use_snapshot({log_handlers.SAMPLE_RATES_CONFIG: '{}'}, generation=1)
+            self.assertTrue(self.sampling_filter.filter(self.record()))
+            self.assertTrue(self.sampling_filter.filter(self.record()))
+        self.assertEqual(realtime_config.get_config.call_count, 1)
+
+        self.use_snapshot({log_handlers.SAMPLE_RATES_CONFIG: '{"core.tasks": 0}'}, generation=2)
+        self.assertFalse(self.sampling_filter.filter(self.record()))
+        self.assertEqual(realtime_config.get_config.call_count, 2)
+
+
+class QueueLogHandlerTests(SimpleTestCase):
+
+    def test_prepare_freezes_message(self):
+        handler = log_handlers.QueueLogHandler()
+        self.addCleanup(handler.close)
+        items = ['first']
+        record = logging.LogRecord('core.tasks', logging.INFO, __file__, 0, 'items %s', (items,), None)
+
+        prepared = handler.prepare(record)
+        items.append('second')
+
+        self.assertEqual(prepared.getMessage(), "items ['first']")
+        self.assertIsNone(prepared.args)
+        # Other handlers of the logger still get the original record
+        self.assertEqual(record.args, (items,))
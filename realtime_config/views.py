@@ -15,8 +15,7 @@ def home(request: HttpRequest) -> HttpResponse:
 
     config_keys: list[str] = list(settings.CONSTANCE_CONFIG.keys())
 
-    configs: Dict[str, Any] = {key: realtime_config.get_config(key) \
-                               for key in config_keys}
+    configs: Dict[str, Any] = realtime_config.get_configs(config_keys)
 
     context: Dict[str, Any] = {
         'site_name': configs.get('SITE_NAME') or "",
@@ -37,7 +36,7 @@ def get_all_configs_api(request: HttpRequest) -> JsonResponse:
     API endpoint that returns current config values as JSON.
     """
     keys: list[str] = list(settings.CONSTANCE_CONFIG.keys())
-    configs: Dict[str, Any] = {key: realtime_config.get_config(key) for key in keys}
+    configs: Dict[str, Any] = realtime_config.get_configs(keys)
     return JsonResponse(configs)
 
 